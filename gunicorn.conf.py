@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+#
+# Configuración de gunicorn (la lee solo al arrancar desde la raíz del proyecto).
+#
+# SERVIDOR=wsgi (por defecto): workers síncronos, una petición por worker.
+# SERVIDOR=asgi: workers de uvicorn; las vistas asíncronas (asistente, contador
+# del carrito) esperan a Gemini o a la sesión sin ocupar el worker.
+
+import os
+
+modo = os.environ.get('SERVIDOR', 'wsgi')
+
+if modo == 'asgi':
+    wsgi_app = 'mi_proyecto.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'mi_proyecto.wsgi:application'
+
+# Los settings leen WEB_CONCURRENCY para rechazar una caché por proceso (locmem)
+# cuando hay varios workers.
+os.environ.setdefault('WEB_CONCURRENCY', '2')
+workers = int(os.environ['WEB_CONCURRENCY'])
@@ -6,7 +6,10 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mi_proyecto.settings')
+    # `manage.py test` usa los ajustes de pruebas; otros runners (pytest-django)
+    # los eligen con DJANGO_SETTINGS_MODULE=mi_proyecto.settings_pruebas.
+    ajustes = 'mi_proyecto.settings_pruebas' if sys.argv[1:2] == ['test'] else 'mi_proyecto.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', ajustes)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
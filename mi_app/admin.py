@@ -1,7 +1,11 @@
 # En tu archivo mi_app/admin.py
 
-from django.contrib import admin
-from .models import Producto, ColorVariante
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from . import busqueda
+from .models import AjusteStock, Producto, ColorVariante, LineaPedido, Pedido, ReservaStock, TareaImagen
+from .stock import ABSOLUTO, DELTA, AjusteInvalido, ajustar_stock
 
 # Usamos TabularInline para gestionar las variantes de color
 # en la misma página de edición de un producto.
@@ -12,14 +16,107 @@ class ColorVarianteInline(admin.TabularInline):
 # Creamos una clase personalizada para el modelo Producto
 class ProductoAdmin(admin.ModelAdmin):
     # La lista de campos que quieres mostrar en la vista de lista de productos
-    list_display = ('nombre', 'categoria', 'precio', 'total_stock')
+    list_display = ('nombre', 'categoria', 'precio', 'stock_total')
     # Filtros para la barra lateral
-    list_filter = ('categoria', 'color_principal')
+    list_filter = ('categoria', 'color_principal', 'en_stock')
     # Campos de búsqueda
     search_fields = ['nombre', 'descripcion']
     # Añadimos el TabularInline que acabamos de crear
     inlines = [ColorVarianteInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        # Usa el índice de texto completo en lugar de LIKE '%q%'.
+        ids = busqueda.buscar_ids(search_term) if search_term.strip() else None
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=ids), False
+
 # Registramos tus modelos en el panel de administración
 admin.site.register(Producto, ProductoAdmin)
-admin.site.register(ColorVariante)
\ No newline at end of file
+
+
+class AjusteStockActionForm(helpers.ActionForm):
+    modo = forms.ChoiceField(
+        choices=[(DELTA, 'Sumar / restar'), (ABSOLUTO, 'Fijar en')], required=False, label='Modo',
+    )
+    cantidad = forms.IntegerField(required=False, label='Cantidad')
+
+
+class ColorVarianteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'producto', 'color', 'stock')
+    list_filter = ('color',)
+    list_select_related = ('producto',)
+    search_fields = ['producto__nombre']
+    action_form = AjusteStockActionForm
+    actions = ['ajustar_stock_seleccion']
+
+    @admin.action(description='Ajustar stock de las variantes seleccionadas')
+    def ajustar_stock_seleccion(self, request, queryset):
+        modo = request.POST.get('modo') or DELTA
+        try:
+            cantidad = int(request.POST.get('cantidad', ''))
+        except ValueError:
+            self.message_user(request, 'Indica una cantidad.', messages.ERROR)
+            return
+        # Una sola pasada para toda la selección, no un save() por variante.
+        ajustes = [(pk, modo, cantidad) for pk in queryset.values_list('pk', flat=True)]
+        try:
+            registros = ajustar_stock(ajustes, request.user, 'Acción del admin')
+        except AjusteInvalido as error:
+            self.message_user(request, str(error), messages.ERROR)
+            return
+        self.message_user(request, f'Stock actualizado en {len(registros)} variantes.', messages.SUCCESS)
+
+
+admin.site.register(ColorVariante, ColorVarianteAdmin)
+
+
+class AjusteStockAdmin(admin.ModelAdmin):
+    list_display = ('creado', 'variante', 'stock_anterior', 'stock_nuevo', 'motivo', 'usuario')
+    list_select_related = ('variante__producto', 'usuario')
+    search_fields = ['motivo', 'variante__producto__nombre']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(AjusteStock, AjusteStockAdmin)
+
+
+class TareaImagenAdmin(admin.ModelAdmin):
+    list_display = ('archivo', 'estado', 'intentos', 'actualizada')
+    list_filter = ('estado',)
+    search_fields = ['archivo', 'sha256']
+    readonly_fields = ('sha256', 'placeholder', 'creada', 'actualizada')
+
+
+admin.site.register(TareaImagen, TareaImagenAdmin)
+
+
+class LineaPedidoInline(admin.TabularInline):
+    model = LineaPedido
+    extra = 0
+    readonly_fields = ('producto', 'variante', 'nombre', 'color', 'precio', 'cantidad')
+    can_delete = False
+
+
+class PedidoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre', 'ciudad', 'unidades', 'total', 'creado')
+    list_filter = ('ciudad', 'metodo_pago')
+    search_fields = ['nombre', 'email', 'dni']
+    readonly_fields = ('total', 'unidades', 'creado')
+    inlines = [LineaPedidoInline]
+
+
+admin.site.register(Pedido, PedidoAdmin)
+
+
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ('variante', 'cantidad', 'clave', 'expira')
+    list_select_related = ('variante__producto',)
+
+
+admin.site.register(ReservaStock, ReservaStockAdmin)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MiAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mi_app'
+
+    def ready(self):
+        # Registra los receptores de señales (derivados de imagen).
+        from . import signals  # noqa: F401
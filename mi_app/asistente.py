@@ -0,0 +1,186 @@
+# mi_app/asistente.py
+
+"""
+Cliente del asistente virtual (API de Gemini).
+
+Reúne lo que comparten la vista de respuesta completa y la de streaming:
+construcción del prompt, caché de respuestas por pregunta normalizada y versión
+del catálogo (`mi_app.versiones`), y un cliente HTTP asíncrono reutilizable con
+timeout.
+"""
+
+import asyncio
+import hashlib
+import json
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Producto
+from .rendimiento import medir
+from .texto import normalizar
+from .versiones import version_catalogo
+
+RESPUESTA_POR_DEFECTO = "Lo siento, no pude obtener una respuesta."
+
+# --- Caché de respuestas ---
+
+def normalizar_pregunta(texto):
+    return normalizar(texto)
+
+
+def clave_respuesta(pregunta):
+    resumen = hashlib.sha256(normalizar_pregunta(pregunta).encode('utf-8')).hexdigest()
+    return f"asistente:respuesta:{version_catalogo()}:{resumen}"
+
+
+def respuesta_en_cache(pregunta):
+    return cache.get(clave_respuesta(pregunta))
+
+
+def guardar_respuesta(pregunta, texto):
+    cache.set(clave_respuesta(pregunta), texto, timeout=settings.GEMINI_CACHE_TIMEOUT)
+
+
+# --- Contexto del catálogo ---
+# Datos fijos de la tienda que antes enviaba el navegador en cada mensaje.
+INFO_TIENDA = {
+    'metodos_pago': ["Yape", "Plin", "Tarjeta de Crédito"],
+    'envio_lima': "1 día hábil",
+    'envio_provincia': "3-5 días hábiles",
+    'whatsapp': "51932187068",
+}
+
+# Límites para acotar el tamaño del prompt aunque el catálogo crezca.
+MAX_PRODUCTOS_DIGEST = 200
+MAX_DESCRIPCION_DIGEST = 160
+
+
+def _recortar(texto, limite):
+    texto = ' '.join((texto or '').split())
+    return texto if len(texto) <= limite else texto[:limite - 1].rstrip() + '…'
+
+
+def construir_digest():
+    """
+    Resumen compacto del catálogo, una línea por producto con sus variantes y stock.
+    Solo lista los colores con stock; los agotados no se ofrecen.
+    """
+    lineas = []
+    productos = Producto.objects.catalogo().order_by('-stock_total', 'nombre')[:MAX_PRODUCTOS_DIGEST]
+    for producto in productos:
+        variantes = ', '.join(
+            f"{variante.get_color_display()} ({variante.stock})" for variante in producto.variantes.all()
+            if variante.stock > 0
+        ) or 'sin stock'
+        lineas.append(
+            f"- {producto.nombre} | {producto.get_categoria_display()} | S/{producto.precio} | "
+            f"stock {producto.total_stock} | colores: {variantes} | {_recortar(producto.descripcion, MAX_DESCRIPCION_DIGEST)}"
+        )
+    return '\n'.join(lineas) or '- (sin productos disponibles)'
+
+
+def digest_catalogo():
+    """
+    Digest del catálogo guardado en caché por versión: se reconstruye una sola vez
+    después de cada cambio en `Producto`/`ColorVariante`.
+    """
+    return cache.get_or_set(f"asistente:digest:{version_catalogo()}", construir_digest, timeout=None)
+
+
+# --- Prompt ---
+def construir_prompt(user_message, digest):
+    return f"""Eres un asistente virtual para una tienda de lencería en línea. Tu objetivo es responder preguntas sobre los productos, métodos de pago y envío, basándote únicamente en la siguiente información. Si la pregunta no se puede responder con la información proporcionada, debes indicar que no tienes esa información y sugerirle que contacte a la tienda por WhatsApp.
+
+        ---
+        INFORMACIÓN DE LA TIENDA:
+        - Productos disponibles (nombre | categoría | precio | stock | colores con stock | descripción):
+{digest}
+        - Métodos de pago aceptados: {', '.join(INFO_TIENDA['metodos_pago'])}.
+        - Tiempos de envío: Lima ({INFO_TIENDA['envio_lima']}), Provincia ({INFO_TIENDA['envio_provincia']}).
+        - Información de contacto: WhatsApp ({INFO_TIENDA['whatsapp']}).
+
+        PREGUNTA DEL USUARIO:
+        {user_message}
+        ---
+
+        Respuesta:"""
+
+
+def payload(prompt):
+    return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+
+def extraer_texto(result, por_defecto=RESPUESTA_POR_DEFECTO):
+    return result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', por_defecto)
+
+
+def url_api(metodo, api_key):
+    return f"{settings.GEMINI_API_BASE}/models/{settings.GEMINI_MODEL}:{metodo}?key={api_key}"
+
+
+# --- Cliente asíncrono ---
+# Un httpx.AsyncClient solo puede usarse en el bucle de eventos que lo creó.
+# Bajo ASGI hay un bucle por worker y su cliente se reutiliza (pool de
+# conexiones). Bajo WSGI (y runserver) `async_to_sync` crea un bucle por
+# petición: un cliente guardado nunca se reutilizaría ni se cerraría, así que
+# se abre y se cierra en cada llamada.
+_clientes = weakref.WeakKeyDictionary()
+
+
+def nuevo_cliente():
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.GEMINI_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+@asynccontextmanager
+async def cliente_async():
+    if settings.SERVIDOR != 'asgi':
+        async with nuevo_cliente() as cliente:
+            yield cliente
+        return
+    bucle = asyncio.get_running_loop()
+    cliente = _clientes.get(bucle)
+    if cliente is None or cliente.is_closed:
+        cliente = _clientes[bucle] = nuevo_cliente()
+    yield cliente
+
+
+async def generar_async(prompt, api_key):
+    """
+    Texto de la respuesta de Gemini, sin ocupar un hilo mientras responde.
+    """
+    with medir('gemini'):
+        async with cliente_async() as cliente:
+            response = await cliente.post(url_api('generateContent', api_key), json=payload(prompt))
+    response.raise_for_status()
+    return extraer_texto(response.json())
+
+
+async def generar_stream(prompt, api_key):
+    """
+    Itera los fragmentos de texto que Gemini envía por SSE (`alt=sse`).
+    """
+    url = url_api('streamGenerateContent', api_key) + '&alt=sse'
+    async with cliente_async() as cliente, cliente.stream('POST', url, json=payload(prompt)) as response:
+        response.raise_for_status()
+        async for linea in response.aiter_lines():
+            if not linea.startswith('data:'):
+                continue
+            texto = extraer_texto(json.loads(linea[len('data:'):]), por_defecto='')
+            if texto:
+                yield texto
+
+
+def evento_sse(datos, evento=None):
+    """
+    Serializa un evento Server-Sent Events.
+    """
+    prefijo = f"event: {evento}\n" if evento else ""
+    return f"{prefijo}data: {json.dumps(datos, ensure_ascii=False)}\n\n"
@@ -0,0 +1,491 @@
+# mi_app/benchmark.py
+
+"""
+Benchmark de los caminos calientes de la tienda.
+
+Cada visitante virtual recorre el flujo de compra: catálogo, detalle de un
+producto, agregar al carrito, contador, ver el carrito y pagar. Hay dos
+conductores con la misma interfaz (`peticion`):
+
+* `ClienteDjango`: el cliente de pruebas de Django, en el mismo proceso. Cuenta
+  las consultas SQL de cada petición.
+* `ClienteHTTP`: peticiones reales con `requests` contra un servidor (gunicorn),
+  con varios visitantes en paralelo. Las consultas se leen de la cabecera
+  `Server-Timing` cuando el servidor mide todas las peticiones
+  (`RENDIMIENTO_MUESTREO=1`).
+
+`resumen` calcula p50/p95/p99, consultas y bytes por vista; `comparar` lo
+contrasta con una línea base guardada en JSON y devuelve las regresiones.
+
+`servidor_gunicorn` levanta gunicorn en modo WSGI o ASGI y `carga` mide el
+rendimiento (peticiones/s) de un endpoint con muchos clientes a la vez; con
+`GeminiSimulado` el asistente responde con una latencia fija sin salir a la red.
+`compras` lanza checkouts simultáneos para medir cómo aguanta la base de datos.
+"""
+
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from PIL import Image, ImageDraw
+
+from . import busqueda, versiones
+from .models import ColorVariante, Producto
+from .storage import AlmacenamientoPorContenido
+
+# Orden del recorrido; también es el orden del informe.
+VISTAS = (
+    'catalogo_publico', 'producto_detalle', 'add_to_cart',
+    'cart_count_view', 'ver_carrito', 'procesar_pago',
+)
+
+DATOS_PAGO = {
+    'nombre': 'Cliente Benchmark', 'dni': '12345678', 'email': 'benchmark@example.com',
+    'celular': '900000000', 'ciudad': 'Lima', 'direccion': 'Av. Prueba 123', 'metodo_pago': 'yape',
+}
+
+# Diferencia mínima de latencia (ms) que se considera regresión, para no
+# marcar el ruido de medición en vistas de uno o dos milisegundos.
+UMBRAL_RUIDO_MS = 2.0
+
+
+# --- Datos sintéticos ---
+
+def imagen_sintetica(semilla, ancho=1000, alto=1250):
+    """
+    PNG parecido a una foto de producto: degradado de fondo y formas de color.
+    """
+    azar = random.Random(semilla)
+    imagen = Image.new('RGB', (ancho, alto))
+    dibujo = ImageDraw.Draw(imagen)
+    base = [azar.randrange(256) for _ in range(3)]
+    for y in range(alto):
+        tono = tuple((c + y * 128 // alto) % 256 for c in base)
+        dibujo.line([(0, y), (ancho, y)], fill=tono)
+    for _ in range(40):
+        x, y = azar.randrange(ancho), azar.randrange(alto)
+        r = azar.randrange(20, 200)
+        color = tuple(azar.randrange(256) for _ in range(3))
+        dibujo.ellipse([x - r, y - r, x + r, y + r], fill=color)
+    buffer = BytesIO()
+    imagen.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def sembrar(productos, variantes=4, imagenes=8, stock=1000, lote=500):
+    """
+    Crea `productos` productos con `variantes` variantes cada uno. Las imágenes
+    se eligen entre `imagenes` PNG distintos (el almacenamiento por contenido
+    guarda cada uno una sola vez). Devuelve los nombres de las imágenes.
+    """
+    storage = AlmacenamientoPorContenido()
+    nombres = [
+        storage.save(f'productos/benchmark-{i}.png', ContentFile(imagen_sintetica(i)))
+        for i in range(imagenes)
+    ]
+    categorias = [valor for valor, _ in Producto.CATEGORIAS_CHOICES]
+    colores = [valor for valor, _ in Producto.COLORES_CHOICES]
+    azar = random.Random(0)
+
+    creados = []
+    for inicio in range(0, productos, lote):
+        nuevos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto de prueba {i}',
+                descripcion=f'Prenda de prueba número {i} para el benchmark del catálogo.',
+                precio=f'{azar.randint(20, 300)}.90',
+                categoria=categorias[i % len(categorias)],
+                color_principal=colores[i % len(colores)],
+                imagen_principal=nombres[i % len(nombres)],
+                stock_total=stock * variantes, en_stock=stock * variantes > 0,
+            )
+            for i in range(inicio, min(inicio + lote, productos))
+        ])
+        ColorVariante.objects.bulk_create([
+            ColorVariante(
+                producto=producto, color=colores[j % len(colores)],
+                imagen=nombres[(producto.pk + j) % len(nombres)], stock=stock,
+            )
+            for producto in nuevos
+            for j in range(variantes)
+        ])
+        creados.extend(producto.pk for producto in nuevos)
+
+    # bulk_create no emite señales: el stock total va en cada producto y el
+    # índice de búsqueda y las versiones se actualizan a mano.
+    busqueda.reconstruir(Producto.objects.prefetch_related('variantes').iterator(chunk_size=lote))
+    versiones.invalidar_productos(creados)
+    return nombres
+
+
+# --- Conductores ---
+
+class ClienteDjango:
+    """
+    Visitante servido en el mismo proceso por el cliente de pruebas.
+    """
+
+    def __init__(self):
+        self.client = Client()
+
+    def peticion(self, metodo, ruta, datos=None):
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            consultas += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            response = getattr(self.client, metodo)(ruta, datos or {})
+            segundos = time.perf_counter() - inicio
+        return (
+            response.status_code, len(response.content), segundos, consultas,
+            response.headers.get('Location', ''),
+        )
+
+
+class ClienteHTTP:
+    """
+    Visitante con su propia sesión HTTP (cookies incluidas) contra `base`.
+
+    Se presenta como el proxy HTTPS de producción (`X-Forwarded-Proto`), así el
+    servidor usa la misma configuración que en Render aunque se pruebe por HTTP.
+    """
+
+    def __init__(self, base):
+        import requests
+
+        self.base = base
+        self.sesion = requests.Session()
+        self.sesion.headers['X-Forwarded-Proto'] = 'https'
+        self.referer = 'https://' + urlsplit(base).netloc + '/'
+
+    def peticion(self, metodo, ruta, datos=None):
+        cabeceras = {}
+        token = self.sesion.cookies.get('csrftoken')
+        if token:
+            cabeceras = {'X-CSRFToken': token, 'Referer': self.referer}
+        inicio = time.perf_counter()
+        response = self.sesion.request(
+            metodo.upper(), urljoin(self.base, ruta), data=datos,
+            headers=cabeceras, allow_redirects=False, timeout=30,
+        )
+        segundos = time.perf_counter() - inicio
+        # Las cookies llegan marcadas como Secure; sin esto no se reenviarían por HTTP.
+        for cookie in self.sesion.cookies:
+            cookie.secure = False
+        return (
+            response.status_code, len(response.content), segundos, consultas_server_timing(response),
+            response.headers.get('Location', ''),
+        )
+
+
+def consultas_server_timing(response):
+    """
+    Número de consultas según `Server-Timing` (None si la petición no se midió).
+    """
+    cabecera = response.headers.get('Server-Timing', '')
+    if 'total;dur=' not in cabecera:
+        return None
+    encontrado = re.search(r'(?:^|, )db;dur=[\d.]+;desc="(\d+)"', cabecera)
+    return int(encontrado.group(1)) if encontrado else 0
+
+
+def resultado_pago(estado, ubicacion):
+    """
+    'ok' si `procesar_pago` redirigió a la compra exitosa, 'sin_stock' si a
+    `error_stock` y 'error' en cualquier otro caso: el pago responde siempre con
+    una redirección, así que el código de estado no basta.
+    """
+    if estado == 302:
+        ruta = urlsplit(ubicacion).path
+        if ruta == reverse('compra_exitosa'):
+            return 'ok'
+        if ruta == reverse('error_stock'):
+            return 'sin_stock'
+    return 'error'
+
+
+def recorrido(cliente, producto_pk, variante_pk):
+    """
+    Flujo de compra de un visitante. Devuelve
+    [(vista, estado, bytes, segundos, consultas, ok)].
+    """
+    pasos = [
+        ('catalogo_publico', 'get', reverse('catalogo_publico'), None),
+        ('producto_detalle', 'get', reverse('producto_detalle', args=[producto_pk]), None),
+        ('add_to_cart', 'post', reverse('add_to_cart'),
+         {'product_id': producto_pk, 'variant_id': variante_pk, 'quantity': 1}),
+        ('cart_count_view', 'get', reverse('cart_count'), None),
+        ('ver_carrito', 'get', reverse('ver_carrito'), None),
+        ('procesar_pago', 'post', reverse('procesar_pago'), DATOS_PAGO),
+    ]
+    mediciones = []
+    for vista, metodo, ruta, datos in pasos:
+        estado, tamano, segundos, consultas, ubicacion = cliente.peticion(metodo, ruta, datos)
+        if vista == 'procesar_pago':
+            ok = resultado_pago(estado, ubicacion) == 'ok'
+        else:
+            ok = estado < 400
+        mediciones.append((vista, estado, tamano, segundos, consultas, ok))
+    return mediciones
+
+
+def ejecutar(fabrica_cliente, variantes, visitantes, concurrencia=1):
+    """
+    Lanza `visitantes` recorridos repartidos entre las variantes dadas
+    ([(producto_pk, variante_pk)]) y agrupa las mediciones por vista.
+    """
+    def visitante(i):
+        producto_pk, variante_pk = variantes[i % len(variantes)]
+        return recorrido(fabrica_cliente(), producto_pk, variante_pk)
+
+    if concurrencia > 1:
+        with ThreadPoolExecutor(concurrencia) as pool:
+            resultados = list(pool.map(visitante, range(visitantes)))
+    else:
+        resultados = [visitante(i) for i in range(visitantes)]
+
+    mediciones = defaultdict(list)
+    for pasos in resultados:
+        for vista, estado, tamano, segundos, consultas, ok in pasos:
+            mediciones[vista].append((estado, tamano, segundos, consultas, ok))
+    return mediciones
+
+
+# --- Estadística e informe ---
+
+def percentil(valores, p):
+    """
+    Percentil `p` (0-100) con interpolación lineal entre los puntos ordenados.
+    """
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicion = (len(ordenados) - 1) * p / 100
+    abajo, arriba = math.floor(posicion), math.ceil(posicion)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (posicion - abajo)
+
+
+def resumen(mediciones):
+    """
+    {vista: {n, errores, p50_ms, p95_ms, p99_ms, consultas, bytes}}.
+    `consultas` y `bytes` son la media por petición.
+    """
+    informe = {}
+    for vista in VISTAS:
+        filas = mediciones.get(vista)
+        if not filas:
+            continue
+        tiempos = [segundos * 1000 for _, _, segundos, _, _ in filas]
+        consultas = [c for _, _, _, c, _ in filas if c is not None]
+        informe[vista] = {
+            'n': len(filas),
+            'errores': sum(1 for *_, ok in filas if not ok),
+            'p50_ms': round(percentil(tiempos, 50), 2),
+            'p95_ms': round(percentil(tiempos, 95), 2),
+            'p99_ms': round(percentil(tiempos, 99), 2),
+            'consultas': round(sum(consultas) / len(consultas), 2) if consultas else None,
+            'bytes': round(sum(tamano for _, tamano, _, _, _ in filas) / len(filas)),
+        }
+    return informe
+
+
+def comparar(actual, base, tolerancia=0.2):
+    """
+    Lista de regresiones de `actual` frente a `base`: latencia p95 o bytes por
+    encima de la tolerancia relativa, o más consultas que en la línea base.
+    """
+    regresiones = []
+    for vista, datos in actual.items():
+        referencia = base.get(vista)
+        if not referencia:
+            continue
+        limite = referencia['p95_ms'] * (1 + tolerancia)
+        if datos['p95_ms'] > limite and datos['p95_ms'] - referencia['p95_ms'] > UMBRAL_RUIDO_MS:
+            regresiones.append(f"{vista}: p95 {datos['p95_ms']} ms > {referencia['p95_ms']} ms")
+        if None not in (datos['consultas'], referencia['consultas']) and datos['consultas'] > referencia['consultas']:
+            regresiones.append(f"{vista}: {datos['consultas']} consultas > {referencia['consultas']}")
+        if datos['bytes'] > referencia['bytes'] * (1 + tolerancia):
+            regresiones.append(f"{vista}: {datos['bytes']} bytes > {referencia['bytes']}")
+        if datos['errores'] > referencia['errores']:
+            regresiones.append(f"{vista}: {datos['errores']} respuestas con error")
+    return regresiones
+
+
+# --- Servidor y carga concurrente ---
+
+@contextmanager
+def servidor_gunicorn(modo='wsgi', puerto=8765, workers=4, entorno=None):
+    """
+    Levanta gunicorn (`gunicorn.conf.py`, `SERVIDOR=modo`) y espera a que
+    responda. Devuelve la URL base.
+
+    Los estáticos se recolectan antes en un STATIC_ROOT temporal, como en un
+    despliegue: las plantillas necesitan el manifiesto de `collectstatic`.
+    """
+    url = f"http://127.0.0.1:{puerto}/"
+    static_root = tempfile.mkdtemp(prefix='benchmark-static-')
+    variables = {
+        **os.environ, **(entorno or {}),
+        'SERVIDOR': modo, 'STATIC_ROOT': static_root, 'WEB_CONCURRENCY': str(workers),
+    }
+    subprocess.run(
+        [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'collectstatic', '--noinput', '-v0'],
+        env=variables, check=True,
+    )
+    proceso = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn',
+        '--bind', f"127.0.0.1:{puerto}",
+    ], env=variables)
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url + 'api/cart-count/', timeout=1)
+                break
+            except OSError:
+                if proceso.poll() is not None:
+                    raise RuntimeError("gunicorn terminó al arrancar.")
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("gunicorn no respondió a tiempo.")
+        yield url
+    finally:
+        proceso.terminate()
+        proceso.wait()
+        shutil.rmtree(static_root, ignore_errors=True)
+
+
+class GeminiSimulado:
+    """
+    Servidor local con la forma de `generateContent` que tarda `latencia`
+    segundos en responder, como una llamada real a Gemini.
+    """
+
+    def __init__(self, latencia=0.5):
+        latencia_respuesta = latencia
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(latencia_respuesta)
+                cuerpo = json.dumps({'candidates': [{'content': {'parts': [{'text': 'Respuesta simulada.'}]}}]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def carga(url, peticiones, concurrencia, metodo='get', cuerpo=None):
+    """
+    Lanza `peticiones` contra `url` con `concurrencia` clientes a la vez.
+    `cuerpo(i)` arma el JSON de la petición i; solo cuenta como correcta una
+    respuesta 2xx (las redirecciones no se siguen). Devuelve lo mismo que
+    `en_paralelo`.
+    """
+    import requests
+
+    local = threading.local()
+
+    def una(i):
+        sesion = getattr(local, 'sesion', None)
+        if sesion is None:
+            sesion = local.sesion = requests.Session()
+        inicio = time.perf_counter()
+        try:
+            response = sesion.request(
+                metodo.upper(), url, json=cuerpo(i) if cuerpo else None,
+                allow_redirects=False, timeout=60,
+            )
+            resultado = 'ok' if 200 <= response.status_code < 300 else 'error'
+        except requests.RequestException:
+            resultado = 'error'
+        return resultado, time.perf_counter() - inicio
+
+    return en_paralelo(una, peticiones, concurrencia)
+
+
+def compras(url, variantes, cantidad, concurrencia):
+    """
+    `cantidad` compradores a la vez, cada uno con su sesión: abren un producto
+    (cookie CSRF), lo agregan al carrito y pagan. Las compras se reparten entre
+    `variantes` ([(producto_pk, variante_pk)]), así varios pagos se disputan las
+    mismas filas. Mide solo `procesar_pago`; los pagos rechazados por falta de
+    stock se cuentan aparte de los errores (ver `resultado_pago`).
+    """
+    def una(i):
+        producto_pk, variante_pk = variantes[i % len(variantes)]
+        cliente = ClienteHTTP(url)
+        cliente.peticion('get', reverse('producto_detalle', args=[producto_pk]))
+        cliente.peticion('post', reverse('add_to_cart'), {
+            'product_id': producto_pk, 'variant_id': variante_pk, 'quantity': 1,
+        })
+        estado, _, segundos, _, ubicacion = cliente.peticion('post', reverse('procesar_pago'), DATOS_PAGO)
+        return resultado_pago(estado, ubicacion), segundos
+
+    return en_paralelo(una, cantidad, concurrencia)
+
+
+def en_paralelo(funcion, cantidad, concurrencia):
+    """
+    Ejecuta `funcion(i)` `cantidad` veces con `concurrencia` hilos y resume el
+    resultado: {n, ok, errores, sin_stock, segundos, por_segundo, p50_ms, p95_ms}.
+    `funcion` devuelve `(resultado, segundos)` con resultado 'ok', 'error' o
+    'sin_stock'.
+    """
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as pool:
+        resultados = list(pool.map(funcion, range(cantidad)))
+    segundos = time.perf_counter() - inicio
+    tiempos = [duracion * 1000 for _, duracion in resultados]
+    conteo = Counter(resultado for resultado, _ in resultados)
+    return {
+        'n': cantidad,
+        'ok': conteo['ok'],
+        'errores': conteo['error'],
+        'sin_stock': conteo['sin_stock'],
+        'segundos': round(segundos, 2),
+        'por_segundo': round(cantidad / segundos, 1) if segundos else 0.0,
+        'p50_ms': round(percentil(tiempos, 50), 1),
+        'p95_ms': round(percentil(tiempos, 95), 1),
+    }
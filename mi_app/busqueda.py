@@ -0,0 +1,176 @@
+# mi_app/busqueda.py
+
+"""
+Índice de búsqueda de texto completo de productos.
+
+Indexa `nombre`, `descripcion` y los colores de las variantes, ya normalizados
+(sin tildes ni mayúsculas), de modo que "lenceria" encuentra "lencería".
+
+- SQLite: tabla virtual FTS5 ordenada por bm25.
+- PostgreSQL: tabla con columna `tsvector` e índice GIN, ordenada por ts_rank.
+- Otros motores: búsqueda `icontains` sin ranking.
+
+El índice se mantiene con señales (`mi_app.signals`) y se puede reconstruir con
+`manage.py reconstruir_busqueda`.
+"""
+
+from django.db import connection
+from django.db.models import Q
+
+from .texto import normalizar
+
+TABLA_SQLITE = 'mi_app_producto_fts'
+TABLA_POSTGRES = 'mi_app_producto_busqueda'
+
+MAX_RESULTADOS = 1000
+
+# Pesos de nombre, descripción y colores en el ranking.
+PESOS_BM25 = (10.0, 1.0, 3.0)
+
+
+def motor(conexion=None):
+    vendor = (conexion or connection).vendor
+    return vendor if vendor in ('sqlite', 'postgresql') else None
+
+
+# --- Esquema (usado por la migración) ---
+def crear_indice(conexion):
+    with conexion.cursor() as cursor:
+        if motor(conexion) == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_SQLITE} USING fts5("
+                "nombre, descripcion, colores, tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif motor(conexion) == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLA_POSTGRES} ("
+                "producto_id bigint PRIMARY KEY REFERENCES mi_app_producto(id) ON DELETE CASCADE "
+                "DEFERRABLE INITIALLY DEFERRED, documento tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLA_POSTGRES}_gin ON {TABLA_POSTGRES} USING GIN (documento)"
+            )
+
+
+def eliminar_indice(conexion):
+    with conexion.cursor() as cursor:
+        if motor(conexion) == 'sqlite':
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_SQLITE}")
+        elif motor(conexion) == 'postgresql':
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_POSTGRES}")
+
+
+# --- Escritura ---
+def documento(producto, colores):
+    """
+    Textos normalizados (nombre, descripción, colores) de un producto.
+    """
+    return (
+        normalizar(producto.nombre),
+        normalizar(producto.descripcion),
+        normalizar(' '.join(colores)),
+    )
+
+
+def _escribir(cursor, producto_id, campos, vendor):
+    if vendor == 'sqlite':
+        cursor.execute(f"DELETE FROM {TABLA_SQLITE} WHERE rowid = %s", [producto_id])
+        cursor.execute(
+            f"INSERT INTO {TABLA_SQLITE} (rowid, nombre, descripcion, colores) VALUES (%s, %s, %s, %s)",
+            [producto_id, *campos],
+        )
+    elif vendor == 'postgresql':
+        cursor.execute(
+            f"INSERT INTO {TABLA_POSTGRES} (producto_id, documento) VALUES (%s, "
+            "setweight(to_tsvector('simple', %s), 'A') || "
+            "setweight(to_tsvector('simple', %s), 'C') || "
+            "setweight(to_tsvector('simple', %s), 'B')) "
+            "ON CONFLICT (producto_id) DO UPDATE SET documento = EXCLUDED.documento",
+            [producto_id, *campos],
+        )
+
+
+def _colores(producto):
+    return [variante.get_color_display() for variante in producto.variantes.all()]
+
+
+def indexar(producto):
+    vendor = motor()
+    if vendor is None:
+        return
+    with connection.cursor() as cursor:
+        _escribir(cursor, producto.pk, documento(producto, _colores(producto)), vendor)
+
+
+def desindexar(producto_id):
+    vendor = motor()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {TABLA_SQLITE} WHERE rowid = %s", [producto_id])
+        elif vendor == 'postgresql':
+            cursor.execute(f"DELETE FROM {TABLA_POSTGRES} WHERE producto_id = %s", [producto_id])
+
+
+def reconstruir(productos, conexion=None):
+    """
+    Vacía el índice y vuelve a indexar `productos` (con sus variantes precargadas).
+    Devuelve el número de productos indexados.
+    """
+    conexion = conexion or connection
+    vendor = motor(conexion)
+    if vendor is None:
+        return 0
+    total = 0
+    with conexion.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_SQLITE if vendor == 'sqlite' else TABLA_POSTGRES}")
+        for producto in productos:
+            _escribir(cursor, producto.pk, documento(producto, _colores(producto)), vendor)
+            total += 1
+    return total
+
+
+# --- Consulta ---
+def _terminos(q):
+    # Cada término se busca como prefijo: "lence" encuentra "lenceria".
+    return normalizar(q).split()
+
+
+def buscar_ids(q, limite=MAX_RESULTADOS):
+    """
+    Ids de productos que contienen todos los términos de `q`, del más al menos relevante.
+    Devuelve None si el motor no tiene índice (se usa el filtro `icontains`).
+    """
+    terminos = _terminos(q)
+    if not terminos:
+        return []
+    vendor = motor()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            consulta = ' '.join(f'"{t}"*' for t in terminos)
+            pesos = ', '.join(str(p) for p in PESOS_BM25)
+            cursor.execute(
+                f"SELECT rowid FROM {TABLA_SQLITE} WHERE {TABLA_SQLITE} MATCH %s "
+                f"ORDER BY bm25({TABLA_SQLITE}, {pesos}), rowid LIMIT %s",
+                [consulta, limite],
+            )
+        elif vendor == 'postgresql':
+            consulta = ' & '.join(f"{t}:*" for t in terminos)
+            cursor.execute(
+                f"SELECT producto_id FROM {TABLA_POSTGRES}, to_tsquery('simple', %s) AS consulta "
+                "WHERE documento @@ consulta "
+                "ORDER BY ts_rank(documento, consulta) DESC, producto_id LIMIT %s",
+                [consulta, limite],
+            )
+        else:
+            return None
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def filtro_icontains(q):
+    """
+    Filtro de respaldo para motores sin índice de texto completo.
+    """
+    filtro = Q()
+    for termino in q.split():
+        filtro &= Q(nombre__icontains=termino) | Q(descripcion__icontains=termino)
+    return filtro
@@ -0,0 +1,272 @@
+# mi_app/cart.py
+
+"""
+Carrito de compras.
+
+Junto a los ítems se guardan el número total de unidades y el importe total, que
+se actualizan en cada cambio. Así las vistas y el context processor no tienen
+que recorrer todo el carrito para mostrar el contador.
+
+El carrito es perezoso: leerlo nunca crea una sesión, solo se escribe al agregar
+el primer producto. Con `CART_STORAGE = 'cookie'` los carritos pequeños viajan en
+una cookie firmada (sin filas en `django_session`); `CartCookieMiddleware` la
+escribe y, si supera `CART_COOKIE_MAX_BYTES`, pasa el carrito a la sesión.
+
+Los datos guardados son una copia del momento en que se agregó el producto.
+`Cart.revisar` los contrasta con la base (precio y stock actuales) con una sola
+consulta antes de mostrar el carrito o cobrarlo.
+"""
+
+import json
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import ColorVariante
+
+CART_SESSION_KEY = 'cart'
+COUNT_SESSION_KEY = 'cart_count'
+TOTAL_SESSION_KEY = 'cart_total'
+CART_KEYS = (CART_SESSION_KEY, COUNT_SESSION_KEY, TOTAL_SESSION_KEY)
+
+CART_COOKIE_NAME = 'cart'
+CART_COOKIE_SALT = 'mi_app.cart'
+
+
+class CookieStore(dict):
+    """
+    Contenedor con la misma interfaz que la sesión para el modo cookie.
+    """
+    modified = False
+
+
+def _store(request):
+    """
+    Devuelve dónde vive el carrito de esta petición: la cookie firmada o la sesión.
+    """
+    if getattr(settings, 'CART_STORAGE', 'session') != 'cookie':
+        return request.session
+    # Un carrito que ya creció y pasó a la sesión se sigue leyendo de ahí.
+    if request.COOKIES.get(settings.SESSION_COOKIE_NAME) and CART_SESSION_KEY in request.session:
+        return request.session
+    if not hasattr(request, 'cart_cookie'):
+        request.cart_cookie = CookieStore(leer_cookie(request))
+    return request.cart_cookie
+
+
+def leer_cookie(request):
+    """
+    Contenido de la cookie firmada del carrito; vacío si falta o fue alterada.
+    """
+    valor = request.get_signed_cookie(CART_COOKIE_NAME, default=None, salt=CART_COOKIE_SALT)
+    try:
+        data = json.loads(valor) if valor else {}
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {k: v for k, v in data.items() if k in CART_KEYS}
+
+
+def serializar_cookie(store):
+    return json.dumps(dict(store), separators=(',', ':'))
+
+
+class RevisionCarrito:
+    """
+    Líneas del carrito con el precio y el stock actuales (ver `revisar_items`).
+    Cada línea es la copia guardada en el carrito más:
+
+    * `price`: precio actual (Decimal) y `subtotal`.
+    * `precio_anterior`: el guardado, si cambió; si no, None.
+    * `stock` y `agotado`: si el stock ya no cubre la cantidad.
+    * `disponible`: False si la variante ya no existe o no es de ese producto.
+    """
+
+    def __init__(self, lineas):
+        self.lineas = lineas
+
+    def __iter__(self):
+        return iter(self.lineas)
+
+    @property
+    def disponibles(self):
+        return [linea for linea in self.lineas if linea['disponible']]
+
+    @property
+    def total(self):
+        return sum((linea['subtotal'] for linea in self.disponibles), Decimal('0'))
+
+    @property
+    def cambios_de_precio(self):
+        return [linea for linea in self.disponibles if linea['precio_anterior'] is not None]
+
+    @property
+    def agotadas(self):
+        return [linea for linea in self.disponibles if linea['agotado']]
+
+    @property
+    def eliminadas(self):
+        return [linea for linea in self.lineas if not linea['disponible']]
+
+
+def revisar_items(items):
+    """
+    Revalida los ítems de un carrito ({variante_id: datos}) contra el precio del
+    producto y el stock de la variante, con una sola consulta sea cual sea el
+    tamaño del carrito. Los importes se calculan con Decimal.
+    """
+    variantes = (
+        ColorVariante.objects.select_related('producto')
+        .only('pk', 'stock', 'producto__nombre', 'producto__precio')
+        .in_bulk([int(item_id) for item_id in items])
+    )
+    lineas = []
+    for item_id, item in items.items():
+        variante = variantes.get(int(item_id))
+        linea = dict(item, id=item_id)
+        cantidad = int(item['quantity'])
+        guardado = Decimal(item['price'])
+        if variante is None or str(variante.producto_id) != str(item['product_id']):
+            linea.update(disponible=False, price=guardado, subtotal=Decimal('0'),
+                         precio_anterior=None, stock=0, agotado=True)
+        else:
+            precio = variante.producto.precio
+            linea.update(
+                disponible=True,
+                name=variante.producto.nombre,
+                price=precio,
+                subtotal=precio * cantidad,
+                precio_anterior=guardado if guardado != precio else None,
+                stock=variante.stock,
+                agotado=variante.stock < cantidad,
+            )
+        lineas.append(linea)
+    return RevisionCarrito(lineas)
+
+
+class Cart:
+
+    def __init__(self, request):
+        self.session = _store(request)
+
+    @staticmethod
+    def count_for(request):
+        """
+        Número de unidades leyendo solo el contador, sin recorrer los ítems.
+        No crea la sesión si el visitante aún no tiene carrito.
+        """
+        return Cart(request).count
+
+    @staticmethod
+    async def acount_for(request):
+        """
+        `count_for` para vistas asíncronas: la sesión se carga con `aget`, que
+        deja sus datos en caché y así la lectura de `Cart` ya no toca la base.
+        """
+        if request.COOKIES.get(settings.SESSION_COOKIE_NAME):
+            await request.session.aget(CART_SESSION_KEY)
+        return Cart(request).count
+
+    @property
+    def items(self):
+        return self.session.get(CART_SESSION_KEY, {})
+
+    @property
+    def count(self):
+        count = self.session.get(COUNT_SESSION_KEY)
+        if count is None:
+            count = sum(item['quantity'] for item in self.items.values())
+        return count
+
+    @property
+    def total(self):
+        total = self.session.get(TOTAL_SESSION_KEY)
+        if total is None:
+            return sum(
+                (Decimal(item['price']) * item['quantity'] for item in self.items.values()),
+                Decimal('0'),
+            )
+        return Decimal(total)
+
+    def __iter__(self):
+        for item_id, item_data in self.items.items():
+            item_data['id'] = item_id
+            yield item_data
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, product, variant, quantity=1):
+        """
+        Agrega `quantity` unidades de una variante, guardando una copia de los datos
+        del producto para mostrar el carrito sin consultar la base de datos.
+        Es la única operación que crea el carrito.
+        """
+        if CART_SESSION_KEY not in self.session:
+            self.session[CART_SESSION_KEY] = {}
+        if COUNT_SESSION_KEY not in self.session:
+            # Carritos anteriores al contador: se calcula una sola vez.
+            self._recalcular()
+        items = self.session[CART_SESSION_KEY]
+
+        key = str(variant.pk)
+        if key in items:
+            items[key]['quantity'] += quantity
+        else:
+            items[key] = {
+                'id': key,
+                'product_id': product.pk,
+                'name': product.nombre,
+                'price': str(product.precio),
+                'color': variant.color,
+                'image_url': variant.imagen.url,
+                'quantity': quantity,
+            }
+        self._actualizar(quantity, Decimal(items[key]['price']) * quantity)
+
+    def revisar(self):
+        """
+        Revalida el carrito (ver `revisar_items`). Si algo cambió, actualiza la
+        copia guardada: nuevos precios y nombres, sin las variantes que ya no
+        existen, y el contador y el total recalculados. Un carrito vacío no
+        consulta la base ni toca la sesión.
+        """
+        if not self.items:
+            return RevisionCarrito([])
+        revision = revisar_items(self.items)
+        if revision.cambios_de_precio or revision.eliminadas or any(
+            linea['name'] != self.items[linea['id']]['name'] for linea in revision.disponibles
+        ):
+            for linea in revision.eliminadas:
+                del self.items[linea['id']]
+            for linea in revision.disponibles:
+                guardado = self.items[linea['id']]
+                guardado['price'] = str(linea['price'])
+                guardado['name'] = linea['name']
+            self._recalcular()
+        return revision
+
+    def remove(self, item_id):
+        item = self.items.pop(str(item_id), None)
+        if item is not None:
+            self._recalcular()
+
+    def clear(self):
+        if CART_SESSION_KEY in self.session:
+            for key in CART_KEYS:
+                self.session.pop(key, None)
+            self.session.modified = True
+
+    def _actualizar(self, delta_count, delta_total):
+        self.session[COUNT_SESSION_KEY] = self.count + delta_count
+        self.session[TOTAL_SESSION_KEY] = str(self.total + delta_total)
+        self.session.modified = True
+
+    def _recalcular(self):
+        self.session[COUNT_SESSION_KEY] = sum(item['quantity'] for item in self.items.values())
+        self.session[TOTAL_SESSION_KEY] = str(sum(
+            (Decimal(item['price']) * item['quantity'] for item in self.items.values()),
+            Decimal('0'),
+        ))
+        self.session.modified = True
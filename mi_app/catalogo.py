@@ -0,0 +1,136 @@
+# mi_app/catalogo.py
+
+"""
+Filtros, búsqueda y paginación por cursor (keyset) del catálogo público.
+
+La paginación usa `pk > último visto` en lugar de OFFSET, así el costo de cada
+página no crece con el número de páginas ya recorridas. Con búsqueda de texto
+los resultados se ordenan por relevancia y el cursor es la posición dentro de
+ese ranking (acotado a `busqueda.MAX_RESULTADOS`).
+
+Con `orden=disponibilidad` se ordena por `stock_total` descendente y el cursor
+lleva (stock_total, pk); ambos filtros de stock usan columnas indexadas de
+`Producto` en lugar de sumar las variantes.
+"""
+
+import base64
+import binascii
+
+from django.db.models import Q
+
+from . import busqueda
+from .models import Producto
+from .versiones import anotar_versiones
+
+TAMANO_PAGINA = 24
+TAMANO_PAGINA_MAX = 100
+ORDEN_DISPONIBILIDAD = 'disponibilidad'
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(*valores):
+    texto = ':'.join(str(valor) for valor in valores)
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, partes=1):
+    """
+    El entero del cursor, o una tupla de `partes` enteros.
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = tuple(int(valor) for valor in base64.urlsafe_b64decode(cursor + relleno).decode().split(':'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorInvalido(cursor)
+    if len(valores) != partes:
+        raise CursorInvalido(cursor)
+    return valores[0] if partes == 1 else valores
+
+
+def filtrar_productos(queryset=None, categoria=None, color=None, disponibles=False):
+    """
+    Aplica los filtros de categoría, color principal y "ocultar agotados".
+    """
+    queryset = Producto.objects.catalogo() if queryset is None else queryset
+    if categoria and categoria != 'all':
+        queryset = queryset.filter(categoria=categoria)
+    if color:
+        queryset = queryset.filter(color_principal=color)
+    if disponibles:
+        queryset = queryset.disponibles()
+    return queryset
+
+
+def pagina(queryset, cursor=None, limite=TAMANO_PAGINA, orden=None):
+    """
+    Devuelve (productos, cursor_siguiente). `cursor_siguiente` es None en la última página.
+    """
+    limite = max(1, min(int(limite), TAMANO_PAGINA_MAX))
+    if orden == ORDEN_DISPONIBILIDAD:
+        # Índice (-stock_total, id). Si el stock cambia entre páginas, un
+        # producto puede repetirse u omitirse, como en cualquier keyset.
+        desde = decodificar_cursor(cursor, partes=2)
+        queryset = queryset.order_by('-stock_total', 'pk')
+        if desde is not None:
+            stock, pk = desde
+            queryset = queryset.filter(Q(stock_total__lt=stock) | Q(stock_total=stock, pk__gt=pk))
+    else:
+        desde = decodificar_cursor(cursor)
+        queryset = queryset.order_by('pk')
+        if desde is not None:
+            queryset = queryset.filter(pk__gt=desde)
+
+    # Se pide uno de más para saber si hay otra página sin hacer un COUNT.
+    productos = list(queryset[:limite + 1])
+    siguiente = None
+    if len(productos) > limite:
+        productos = productos[:limite]
+        ultimo = productos[-1]
+        if orden == ORDEN_DISPONIBILIDAD:
+            siguiente = codificar_cursor(ultimo.stock_total, ultimo.pk)
+        else:
+            siguiente = codificar_cursor(ultimo.pk)
+    return anotar_versiones(productos), siguiente
+
+
+def pagina_busqueda(queryset, q, cursor=None, limite=TAMANO_PAGINA):
+    """
+    Como `pagina`, pero con los resultados de la búsqueda ordenados por relevancia.
+    """
+    limite = max(1, min(int(limite), TAMANO_PAGINA_MAX))
+    ids = busqueda.buscar_ids(q)
+    if ids is None:
+        # Motor sin índice de texto completo.
+        return pagina(queryset.filter(busqueda.filtro_icontains(q)), cursor, limite)
+
+    desde = decodificar_cursor(cursor) or 0
+    permitidos = set(queryset.filter(pk__in=ids).values_list('pk', flat=True))
+    ranking = [pk for pk in ids if pk in permitidos]
+    ids_pagina = ranking[desde:desde + limite]
+    por_pk = {producto.pk: producto for producto in queryset.filter(pk__in=ids_pagina)}
+    productos = [por_pk[pk] for pk in ids_pagina if pk in por_pk]
+    siguiente = codificar_cursor(desde + limite) if len(ranking) > desde + limite else None
+    return anotar_versiones(productos), siguiente
+
+
+def desde_request(request):
+    """
+    Productos y cursor siguiente según los parámetros GET de la petición.
+    """
+    queryset = filtrar_productos(
+        categoria=request.GET.get('categoria'),
+        color=request.GET.get('color'),
+        disponibles=request.GET.get('disponibles') == '1',
+    )
+    q = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    limite = request.GET.get('limite', TAMANO_PAGINA)
+    if q:
+        # Con búsqueda manda la relevancia.
+        return pagina_busqueda(queryset, q, cursor, limite)
+    return pagina(queryset, cursor, limite, request.GET.get('orden'))
@@ -0,0 +1,16 @@
+# mi_app/context_processors.py
+
+from django.utils.functional import SimpleLazyObject
+
+from .cart import Cart
+
+
+def cart(request):
+    """
+    Expone `cart_count` y `cart_total` a todas las plantillas.
+    Es perezoso: el carrito solo se lee si la plantilla usa la variable.
+    """
+    return {
+        'cart_count': SimpleLazyObject(lambda: Cart.count_for(request)),
+        'cart_total': SimpleLazyObject(lambda: Cart(request).total),
+    }
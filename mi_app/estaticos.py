@@ -0,0 +1,172 @@
+# mi_app/estaticos.py
+
+"""
+Hoja de estilos de la tienda generada en el build, en lugar del script de
+Tailwind del CDN que compilaba el CSS en el navegador en cada página.
+
+`construir` hace tres cosas:
+
+* Compila `estilos/tienda.css` con la CLI de Tailwind (paquete
+  `tailwindcss-bin`), que recorre las plantillas y emite solo las clases usadas,
+  minificadas.
+* Recorta las fuentes de Font Awesome (paquete `fontawesomefree`) a los iconos
+  que aparecen en las plantillas y las guarda como WOFF2 (`fontTools`).
+* Añade al CSS las reglas `@font-face` y `.fa-*` de esos iconos.
+
+El resultado queda en `static/mi_app/` y `collectstatic` lo copia a
+STATIC_ROOT, donde `CompressedManifestStaticFilesStorage` le pone hash en el
+nombre y lo comprime en gzip y brotli.
+"""
+
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+ENTRADA = APP_DIR / 'estilos' / 'tienda.css'
+PLANTILLAS = APP_DIR / 'templates'
+SALIDA = APP_DIR / 'static' / 'mi_app'
+CSS = 'css/tienda.css'
+
+# Prefijo de clase -> (archivo de Font Awesome, fuente generada, peso).
+FUENTES = {
+    'fas': ('fa-solid-900.woff2', 'fonts/iconos-solid.woff2', 900),
+    'fab': ('fa-brands-400.woff2', 'fonts/iconos-marcas.woff2', 400),
+}
+FAMILIA = {'fas': 'Iconos', 'fab': 'Iconos Marcas'}
+
+# Clases de Font Awesome que no son iconos.
+CLASES_NO_ICONO = {'fa-solid', 'fa-brands', 'fa-regular', 'fa-spin', 'fa-pulse', 'fa-fw', 'fa-lg', 'fa-2x', 'fa-3x'}
+
+
+class ErrorEstaticos(Exception):
+    pass
+
+
+def textos_plantillas(directorio=PLANTILLAS):
+    for ruta in sorted(Path(directorio).rglob('*.html')):
+        yield ruta.read_text(encoding='utf-8')
+
+
+def iconos_usados(textos):
+    """
+    {prefijo: {clase}} con las clases `fa-*` de cada elemento, según su prefijo
+    (`fas`, `fab`). Un icono sin prefijo se toma como sólido.
+    """
+    usados = {prefijo: set() for prefijo in FUENTES}
+    for texto in textos:
+        for atributo in re.findall(r'class\s*=\s*["\']([^"\']*)["\']', texto):
+            clases = atributo.split()
+            iconos = {c for c in clases if c.startswith('fa-') and c not in CLASES_NO_ICONO}
+            if not iconos:
+                continue
+            prefijo = 'fab' if 'fab' in clases or 'fa-brands' in clases else 'fas'
+            usados[prefijo] |= iconos
+    return usados
+
+
+def codigos_iconos(css):
+    """
+    {clase: código} a partir del CSS de Font Awesome (`.fa-x:before{content:"\\f07a"}`).
+    """
+    codigos = {}
+    for selectores, codigo in re.findall(r'([^{}]+)\{content:\s*"\\([0-9a-fA-F]+)"\}', css):
+        for clase in re.findall(r'\.(fa-[a-z0-9-]+):{1,2}before', selectores):
+            codigos.setdefault(clase, int(codigo, 16))
+    return codigos
+
+
+def recortar_fuente(origen, destino, codigos):
+    """
+    Guarda en `destino` un WOFF2 con solo los glifos de `codigos`.
+    """
+    from fontTools import subset
+
+    opciones = subset.Options()
+    opciones.flavor = 'woff2'
+    opciones.layout_features = ['*']
+    fuente = subset.load_font(str(origen), opciones)
+    recortador = subset.Subsetter(opciones)
+    recortador.populate(unicodes=codigos)
+    recortador.subset(fuente)
+    Path(destino).parent.mkdir(parents=True, exist_ok=True)
+    subset.save_font(fuente, str(destino), opciones)
+
+
+def css_iconos(usados, codigos):
+    """
+    Reglas CSS de los iconos usados. Las URL son relativas a `css/` para que
+    `collectstatic` las reescriba con el nombre con hash.
+    """
+    reglas = []
+    for prefijo, (_, destino, peso) in FUENTES.items():
+        if not usados[prefijo]:
+            continue
+        reglas.append(
+            f'@font-face{{font-family:"{FAMILIA[prefijo]}";font-style:normal;font-weight:{peso};'
+            f'font-display:block;src:url(../{destino}) format("woff2")}}'
+        )
+        reglas.append(
+            f'.{prefijo}{{font-family:"{FAMILIA[prefijo]}";font-weight:{peso};display:inline-block;'
+            'font-style:normal;font-variant:normal;line-height:1;text-rendering:auto;'
+            '-webkit-font-smoothing:antialiased;-moz-osx-font-smoothing:grayscale}'
+        )
+        for clase in sorted(usados[prefijo]):
+            reglas.append(f'.{clase}:before{{content:"\\{codigos[clase]:x}"}}')
+    return ''.join(reglas)
+
+
+def binario_tailwind():
+    binario = shutil.which('tailwindcss')
+    if binario is None:
+        raise ErrorEstaticos("No se encontró la CLI de Tailwind; instala `tailwindcss-bin`.")
+    return binario
+
+
+def directorio_fontawesome():
+    try:
+        import fontawesomefree
+    except ImportError:
+        raise ErrorEstaticos("Falta Font Awesome; instala `fontawesomefree`.")
+    return Path(fontawesomefree.__file__).resolve().parent / 'static' / 'fontawesomefree'
+
+
+def construir(salida=SALIDA, tailwind=None):
+    """
+    Genera `css/tienda.css` y las fuentes de iconos en `salida`. Devuelve
+    {ruta relativa: bytes} de cada archivo escrito.
+    """
+    salida = Path(salida)
+    fontawesome = directorio_fontawesome()
+    with tempfile.TemporaryDirectory() as temporal:
+        compilado = Path(temporal) / 'tienda.css'
+        proceso = subprocess.run(
+            [tailwind or binario_tailwind(), '--input', str(ENTRADA), '--output', str(compilado), '--minify'],
+            cwd=APP_DIR, capture_output=True, text=True,
+        )
+        if proceso.returncode != 0:
+            raise ErrorEstaticos(f"Tailwind falló: {proceso.stderr.strip()}")
+        css = compilado.read_text(encoding='utf-8')
+
+    usados = iconos_usados(textos_plantillas())
+    codigos = codigos_iconos((fontawesome / 'css' / 'all.min.css').read_text(encoding='utf-8'))
+    desconocidos = sorted(clase for clases in usados.values() for clase in clases if clase not in codigos)
+    if desconocidos:
+        raise ErrorEstaticos(f"Iconos que no existen en Font Awesome: {', '.join(desconocidos)}")
+
+    escritos = {}
+    for prefijo, (origen, destino, _) in FUENTES.items():
+        if usados[prefijo]:
+            recortar_fuente(
+                fontawesome / 'webfonts' / origen, salida / destino,
+                [codigos[clase] for clase in usados[prefijo]],
+            )
+            escritos[destino] = (salida / destino).stat().st_size
+
+    ruta_css = salida / CSS
+    ruta_css.parent.mkdir(parents=True, exist_ok=True)
+    ruta_css.write_text(css.rstrip('\n') + '\n' + css_iconos(usados, codigos) + '\n', encoding='utf-8')
+    escritos[CSS] = ruta_css.stat().st_size
+    return escritos
@@ -2,7 +2,10 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.forms import inlineformset_factory
 from django.contrib.auth import get_user_model
+import re
+
 from .models import Producto, ColorVariante
+from .stock import ABSOLUTO, DELTA
 
 # Importamos el modelo de usuario de Django
 User = get_user_model()
@@ -87,4 +90,41 @@ ColorVarianteFormSet = inlineformset_factory(
 # Formulario para el inicio de sesión
 class LoginForm(AuthenticationForm):
     username = forms.CharField(label="Usuario", widget=forms.TextInput(attrs={'class': 'w-full px-4 py-2 border rounded-lg'}))
-    password = forms.CharField(label="Contraseña", widget=forms.PasswordInput(attrs={'class': 'w-full px-4 py-2 border rounded-lg'}))
\ No newline at end of file
+    password = forms.CharField(label="Contraseña", widget=forms.PasswordInput(attrs={'class': 'w-full px-4 py-2 border rounded-lg'}))
+
+# Formulario de ajuste masivo de stock (una línea por variante)
+class AjusteStockForm(forms.Form):
+    """
+    Cada línea es `variante_id cantidad`. Con signo (`+5`, `-3`) la cantidad se
+    suma al stock actual; sin signo (`20` o `=20`) lo reemplaza.
+    """
+    LINEA = re.compile(r'^\s*(\d+)\s*[,;\t ]\s*([+=-]?)\s*(\d+)\s*$')
+
+    lineas = forms.CharField(
+        label="Ajustes",
+        widget=forms.Textarea(attrs={
+            'class': 'w-full px-4 py-2 border rounded-lg font-mono', 'rows': 12,
+            'placeholder': "12 +5\n13 -2\n14 =20",
+        }),
+    )
+    motivo = forms.CharField(
+        label="Motivo", max_length=200, required=False,
+        widget=forms.TextInput(attrs={'class': 'w-full px-4 py-2 border rounded-lg', 'placeholder': 'Guía de remisión 0042'}),
+    )
+
+    def clean_lineas(self):
+        ajustes = []
+        for numero, linea in enumerate(self.cleaned_data['lineas'].splitlines(), start=1):
+            if not linea.strip():
+                continue
+            encontrado = self.LINEA.match(linea)
+            if not encontrado:
+                raise forms.ValidationError(f"Línea {numero} no válida: «{linea.strip()}»")
+            variante_id, signo, cantidad = encontrado.groups()
+            if signo in ('+', '-'):
+                ajustes.append((int(variante_id), DELTA, int(cantidad) * (-1 if signo == '-' else 1)))
+            else:
+                ajustes.append((int(variante_id), ABSOLUTO, int(cantidad)))
+        if not ajustes:
+            raise forms.ValidationError("No hay ajustes.")
+        return ajustes
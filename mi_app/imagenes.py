@@ -0,0 +1,134 @@
+# mi_app/imagenes.py
+
+"""
+Generación de derivados de imagen (miniaturas WebP/JPEG a anchos fijos).
+
+Las imágenes subidas son PNG de varios megabytes; el catálogo sirve en su lugar
+versiones redimensionadas mediante `srcset`. Los nombres de los derivados se
+calculan a partir del nombre del archivo original, así las plantillas pueden
+construir las URLs sin consultar la base de datos.
+"""
+
+import base64
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image
+
+# Anchos (en píxeles) de los derivados que se generan para cada imagen.
+ANCHOS_DERIVADOS = (320, 640, 1024)
+
+# Formato -> (extensión, tipo MIME, opciones de guardado de Pillow).
+FORMATOS_DERIVADOS = {
+    'webp': ('webp', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+CARPETA_DERIVADOS = 'derivados'
+
+
+def nombre_derivado(nombre, ancho, formato='webp'):
+    """
+    Devuelve la ruta del derivado, p. ej. `productos/Imagen56.png` ->
+    `derivados/productos/Imagen56-320.webp`.
+    """
+    extension = FORMATOS_DERIVADOS[formato][0]
+    base, _ = posixpath.splitext(nombre)
+    return posixpath.join(CARPETA_DERIVADOS, f"{base}-{ancho}.{extension}")
+
+
+def derivados_completos(field_file):
+    """
+    Indica si ya existen los derivados de una imagen.
+    El derivado más grande se escribe al final, por lo que basta comprobarlo a él.
+    """
+    if not field_file:
+        return False
+    ultimo = nombre_derivado(field_file.name, ANCHOS_DERIVADOS[-1], list(FORMATOS_DERIVADOS)[-1])
+    return field_file.storage.exists(ultimo)
+
+
+def _aplanar(imagen):
+    # JPEG no admite transparencia: se compone sobre fondo blanco.
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.split()[-1])
+        return fondo
+    return imagen.convert('RGB')
+
+
+def derivar(imagen, storage, nombre):
+    """
+    Escribe en `storage` los derivados de una imagen de Pillow ya cargada,
+    usando `nombre` (el del archivo original) para calcular sus rutas.
+    """
+    escritos = []
+    for ancho in ANCHOS_DERIVADOS:
+        # No se amplían imágenes más pequeñas que el ancho pedido.
+        ancho_final = min(ancho, imagen.width)
+        alto_final = max(1, round(imagen.height * ancho_final / imagen.width))
+        redimensionada = imagen.resize((ancho_final, alto_final), Image.LANCZOS)
+
+        for formato, (_, _, opciones) in FORMATOS_DERIVADOS.items():
+            salida = redimensionada if formato == 'webp' else _aplanar(redimensionada)
+            buffer = BytesIO()
+            salida.save(buffer, format=formato.upper(), **opciones)
+
+            destino = nombre_derivado(nombre, ancho, formato)
+            if storage.exists(destino):
+                storage.delete(destino)
+            escritos.append(storage.save(destino, ContentFile(buffer.getvalue())))
+    return escritos
+
+
+def generar_derivados(field_file, forzar=False):
+    """
+    Genera todos los derivados de `field_file` en su mismo storage.
+    Devuelve la lista de nombres escritos (vacía si ya existían).
+    """
+    if not field_file or (not forzar and derivados_completos(field_file)):
+        return []
+
+    with field_file.storage.open(field_file.name, 'rb') as original:
+        imagen = Image.open(original)
+        imagen.load()
+    return derivar(imagen, field_file.storage, field_file.name)
+
+
+def generar_placeholder(imagen, ancho=16):
+    """
+    Miniatura JPEG diminuta codificada como data URI, para mostrar mientras
+    carga la imagen real.
+    """
+    alto = max(1, round(imagen.height * ancho / imagen.width))
+    miniatura = _aplanar(imagen.resize((ancho, alto), Image.BILINEAR))
+    buffer = BytesIO()
+    miniatura.save(buffer, format='JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def srcset(field_file, formato='webp'):
+    """
+    Cadena `srcset` con todos los anchos, o vacía si aún no hay derivados.
+    """
+    if not derivados_completos(field_file):
+        return ''
+    storage = field_file.storage
+    return ', '.join(
+        f"{storage.url(nombre_derivado(field_file.name, ancho, formato))} {ancho}w"
+        for ancho in ANCHOS_DERIVADOS
+    )
+
+
+def url_derivado(field_file, ancho, formato='webp'):
+    """
+    URL del derivado más cercano a `ancho`, con la imagen original como respaldo.
+    """
+    if not field_file:
+        return ''
+    if not derivados_completos(field_file):
+        return field_file.url
+    elegido = next((a for a in ANCHOS_DERIVADOS if a >= ancho), ANCHOS_DERIVADOS[-1])
+    return field_file.storage.url(nombre_derivado(field_file.name, elegido, formato))
@@ -0,0 +1,402 @@
+# mi_app/importacion.py
+
+"""
+Importación y exportación masiva del catálogo en CSV o JSONL.
+
+Los archivos se leen y escriben en streaming: en memoria solo hay un lote de
+productos a la vez. Cada lote se guarda en su propia transacción con
+`bulk_create`/`bulk_update`, así una carga de miles de productos son unas pocas
+decenas de consultas por lote y no dos formularios por producto.
+
+Formatos:
+
+* CSV: una fila por variante, con las columnas de `COLUMNAS_CSV`. Las filas de
+  un mismo producto van seguidas; los datos del producto se toman de la primera.
+* JSONL: un producto por línea, con sus variantes en la lista `variantes`.
+
+Un producto se identifica por `id` si viene y existe, y si no por `nombre`; una
+variante, por su producto y su `color`. El stock se reemplaza (no se suma), de
+modo que importar dos veces el mismo archivo deja el mismo resultado.
+
+Un CSV sin las columnas de `COLUMNAS_REQUERIDAS`, o un archivo cuyo primer
+registro ya es inválido, se rechaza antes de guardar nada. Después, los
+registros inválidos se omiten y se informan sin cortar la importación.
+"""
+
+import csv
+import json
+import os
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from django.core.files import File
+from django.db import transaction
+
+from . import busqueda
+from .models import ColorVariante, Producto, TareaImagen
+from .recoleccion import recolectar_huerfanos
+from .stock import sumar_stock_productos
+from .versiones import invalidar_productos
+
+COLUMNAS_CSV = (
+    'id', 'nombre', 'descripcion', 'precio', 'categoria', 'color_principal',
+    'imagen_principal', 'color', 'imagen', 'stock',
+)
+CAMPOS_PRODUCTO = ('nombre', 'descripcion', 'precio', 'categoria', 'color_principal', 'imagen_principal')
+COLUMNAS_REQUERIDAS = ('nombre', 'precio')
+
+# Filas por UPDATE en `bulk_update`: con lotes grandes el CASE WHEN generado
+# se vuelve más lento que varias sentencias cortas.
+TAMANO_UPDATE = 100
+
+CATEGORIAS = {valor for valor, _ in Producto.CATEGORIAS_CHOICES}
+COLORES = {valor for valor, _ in Producto.COLORES_CHOICES}
+
+
+class ErrorImportacion(Exception):
+    """
+    Registro inválido; `linea` es su número en el archivo.
+    """
+
+    def __init__(self, linea, mensaje):
+        super().__init__(f"Línea {linea}: {mensaje}")
+        self.linea = linea
+
+
+# --- Lectura ---
+
+def leer_csv(archivo):
+    """
+    Genera (línea, registro) agrupando las filas seguidas de un mismo producto.
+    Lanza `ErrorImportacion` si a la cabecera le faltan columnas requeridas.
+    """
+    lector = csv.DictReader(archivo)
+    faltan = [columna for columna in COLUMNAS_REQUERIDAS if columna not in (lector.fieldnames or ())]
+    if faltan:
+        raise ErrorImportacion(1, f"faltan las columnas {', '.join(faltan)} en la cabecera")
+
+    def clave(fila):
+        return (fila.get('id') or '', fila['nombre'])
+
+    filas = ((lector.line_num, fila) for fila in lector)
+    for _, grupo in groupby(filas, key=lambda par: clave(par[1])):
+        grupo = list(grupo)
+        linea, primera = grupo[0]
+        registro = {campo: primera.get(campo, '') for campo in ('id',) + CAMPOS_PRODUCTO}
+        registro['variantes'] = [
+            {'color': fila['color'], 'imagen': fila.get('imagen', ''), 'stock': fila.get('stock', '')}
+            for _, fila in grupo if fila.get('color')
+        ]
+        yield linea, registro
+
+
+def leer_jsonl(archivo):
+    """
+    Genera (línea, registro); una línea que no es JSON se entrega como
+    `ErrorImportacion` en lugar del registro para que `importar` la omita.
+    """
+    for linea, texto in enumerate(archivo, start=1):
+        if texto.strip():
+            try:
+                yield linea, json.loads(texto)
+            except ValueError as error:
+                yield linea, ErrorImportacion(linea, f"JSON inválido ({error})")
+
+
+def validar(linea, registro):
+    """
+    Devuelve el registro con tipos normalizados o lanza `ErrorImportacion`.
+    """
+    if isinstance(registro, ErrorImportacion):
+        raise registro
+    if not isinstance(registro, dict):
+        raise ErrorImportacion(linea, "se esperaba un objeto JSON")
+    nombre = str(registro.get('nombre') or '').strip()
+    if not nombre:
+        raise ErrorImportacion(linea, "falta el nombre")
+    try:
+        precio = Decimal(str(registro.get('precio'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ErrorImportacion(linea, f"precio inválido: {registro.get('precio')!r}")
+    categoria = registro.get('categoria') or 'lenceria'
+    if categoria not in CATEGORIAS:
+        raise ErrorImportacion(linea, f"categoría desconocida: {categoria!r}")
+    color_principal = registro.get('color_principal') or 'red'
+    if color_principal not in COLORES:
+        raise ErrorImportacion(linea, f"color desconocido: {color_principal!r}")
+
+    variantes = {}
+    if not isinstance(registro.get('variantes') or [], list):
+        raise ErrorImportacion(linea, "`variantes` debe ser una lista")
+    for variante in registro.get('variantes') or []:
+        if not isinstance(variante, dict):
+            raise ErrorImportacion(linea, f"variante inválida: {variante!r}")
+        color = variante.get('color')
+        if color not in COLORES:
+            raise ErrorImportacion(linea, f"color desconocido: {color!r}")
+        try:
+            stock = int(variante.get('stock') or 0)
+        except (TypeError, ValueError):
+            raise ErrorImportacion(linea, f"stock inválido: {variante.get('stock')!r}")
+        if stock < 0:
+            raise ErrorImportacion(linea, "el stock no puede ser negativo")
+        variantes[color] = {'imagen': variante.get('imagen') or '', 'stock': stock}
+
+    identificador = str(registro.get('id') or '').strip()
+    if identificador and not identificador.isdigit():
+        raise ErrorImportacion(linea, f"id inválido: {identificador!r}")
+
+    return {
+        'id': int(identificador) if identificador else None,
+        'nombre': nombre,
+        'descripcion': registro.get('descripcion') or '',
+        'precio': precio,
+        'categoria': categoria,
+        'color_principal': color_principal,
+        'imagen_principal': registro.get('imagen_principal') or '',
+        'variantes': variantes,
+    }
+
+
+# --- Imágenes ---
+
+class ResolutorImagenes:
+    """
+    Convierte la ruta de imagen de un registro en un nombre del storage.
+
+    Un nombre que ya existe en el storage (p. ej. `productos/<hash>.png`, como
+    los exporta `export_catalog`) se usa tal cual. Si no, se busca el archivo en
+    `carpeta` (o como ruta absoluta) y se sube; el almacenamiento por contenido
+    no duplica imágenes repetidas.
+    """
+
+    def __init__(self, storage, carpeta=None):
+        self.storage = storage
+        self.carpeta = carpeta
+        self.resueltas = {}
+        self.subidas = set()
+
+    def __call__(self, linea, ruta):
+        if not ruta:
+            return ''
+        if ruta not in self.resueltas:
+            self.resueltas[ruta] = self.resolver(linea, ruta)
+        return self.resueltas[ruta]
+
+    def resolver(self, linea, ruta):
+        if self.storage.exists(ruta):
+            return ruta
+        local = ruta if os.path.isabs(ruta) else os.path.join(self.carpeta or os.getcwd(), ruta)
+        if not os.path.isfile(local):
+            raise ErrorImportacion(linea, f"imagen no encontrada: {ruta}")
+        with open(local, 'rb') as archivo:
+            nombre = self.storage.save(f"productos/{os.path.basename(local)}", File(archivo))
+        self.subidas.add(nombre)
+        return nombre
+
+
+# --- Guardado por lotes ---
+
+def guardar_lote(lote, errores):
+    """
+    Crea o actualiza los productos y variantes de un lote de (línea, registro)
+    ya validados y con sus imágenes resueltas, en una transacción. Devuelve un dict con los contadores; las
+    variantes nuevas sin imagen se omiten y se agregan a `errores`.
+    """
+    contadores = dict.fromkeys(
+        ('productos_creados', 'productos_actualizados', 'variantes_creadas', 'variantes_actualizadas'), 0,
+    )
+    with transaction.atomic():
+        # Productos existentes del lote: dos consultas (por id y por nombre).
+        por_id = Producto.objects.in_bulk([r['id'] for _, r in lote if r['id']])
+        por_nombre = {}
+        for producto in Producto.objects.filter(nombre__in=[r['nombre'] for _, r in lote]).order_by('pk'):
+            por_nombre.setdefault(producto.nombre, producto)
+
+        nuevos, encontrados, cambiados, pares = [], set(), {}, []
+        # Imágenes sustituidas: se recolectan si quedan huérfanas.
+        reemplazadas = set()
+        for linea, registro in lote:
+            producto = por_id.get(registro['id']) or por_nombre.get(registro['nombre'])
+            if producto is None:
+                producto = Producto()
+                nuevos.append(producto)
+                por_nombre[registro['nombre']] = producto
+            elif producto.pk:
+                encontrados.add(producto.pk)
+            for campo in CAMPOS_PRODUCTO:
+                valor = registro[campo]
+                if campo == 'imagen_principal':
+                    if not valor:
+                        continue
+                    actual = producto.imagen_principal.name
+                else:
+                    actual = getattr(producto, campo)
+                if actual != valor:
+                    if campo == 'imagen_principal' and actual:
+                        reemplazadas.add(actual)
+                    setattr(producto, campo, valor)
+                    if producto.pk:
+                        cambiados[producto.pk] = producto
+            pares.append((linea, producto, registro['variantes']))
+
+        # Solo se escriben las filas que cambian: reimportar el mismo archivo
+        # no genera escrituras.
+        Producto.objects.bulk_create(nuevos)
+        Producto.objects.bulk_update(list(cambiados.values()), CAMPOS_PRODUCTO, batch_size=TAMANO_UPDATE)
+        contadores['productos_creados'] = len(nuevos)
+        contadores['productos_actualizados'] = len(cambiados)
+
+        # Variantes existentes de todos los productos del lote: una consulta.
+        # FOR UPDATE en orden de pk (como `stock._ajustar_lote`): un checkout
+        # simultáneo espera y no se pierde su descuento al escribir el stock
+        # absoluto ni se desajusta `stock_total`. Si un color se repite, gana
+        # la variante más antigua.
+        variantes_existentes = {}
+        for variante in (
+            ColorVariante.objects.select_for_update()
+            .filter(producto_id__in=list(encontrados)).order_by('pk')
+        ):
+            variantes_existentes.setdefault((variante.producto_id, variante.color), variante)
+        crear, actualizar, diferencias = [], {}, {}
+        tocados = {producto.pk for producto in nuevos} | set(cambiados)
+        for linea, producto, variantes in pares:
+            for color, datos in variantes.items():
+                variante = variantes_existentes.get((producto.pk, color))
+                imagen = datos['imagen']
+                if variante is None:
+                    if not imagen:
+                        errores.append(ErrorImportacion(linea, f"la variante {color} necesita imagen"))
+                        continue
+                    variante = ColorVariante(producto=producto, color=color, imagen=imagen, stock=datos['stock'])
+                    variantes_existentes[(producto.pk, color)] = variante
+                    crear.append(variante)
+                    tocados.add(producto.pk)
+                    diferencias[producto.pk] = diferencias.get(producto.pk, 0) + datos['stock']
+                elif variante.stock != datos['stock'] or (imagen and variante.imagen.name != imagen):
+                    diferencias[producto.pk] = diferencias.get(producto.pk, 0) + datos['stock'] - variante.stock
+                    variante.stock = datos['stock']
+                    if imagen and variante.imagen.name != imagen:
+                        reemplazadas.add(variante.imagen.name)
+                        variante.imagen = imagen
+                    if variante.pk:
+                        actualizar[variante.pk] = variante
+                    tocados.add(producto.pk)
+        ColorVariante.objects.bulk_create(crear)
+        ColorVariante.objects.bulk_update(list(actualizar.values()), ['imagen', 'stock'], batch_size=TAMANO_UPDATE)
+        contadores['variantes_creadas'] = len(crear)
+        contadores['variantes_actualizadas'] = len(actualizar)
+        sumar_stock_productos(diferencias)
+
+        # Las operaciones masivas no emiten señales: índice y caché se
+        # actualizan aquí, solo para los productos que cambiaron.
+        if tocados:
+            for producto in Producto.objects.filter(pk__in=tocados).prefetch_related('variantes'):
+                busqueda.indexar(producto)
+            transaction.on_commit(lambda: invalidar_productos(tocados))
+        if reemplazadas:
+            transaction.on_commit(lambda: recolectar_huerfanos(reemplazadas))
+    return contadores
+
+
+def encolar_subidas(nombres):
+    """
+    Tareas de imagen (derivados, placeholder) para las imágenes nuevas.
+    """
+    TareaImagen.objects.bulk_create(
+        [TareaImagen(archivo=nombre) for nombre in nombres], ignore_conflicts=True,
+    )
+
+
+def resolver_imagenes(linea, registro, resolver_imagen):
+    """
+    Sube (o encuentra) las imágenes de un registro validado antes de meterlo
+    en un lote: una imagen que falta descarta el registro, no el lote.
+    """
+    registro['imagen_principal'] = resolver_imagen(linea, registro['imagen_principal'])
+    for datos in registro['variantes'].values():
+        datos['imagen'] = resolver_imagen(linea, datos['imagen'])
+    return registro
+
+
+def importar(registros, resolver_imagen, lote=500, errores=None):
+    """
+    Guarda los (línea, registro) de `registros` por lotes de `lote` productos.
+    Devuelve los contadores acumulados.
+
+    Los registros inválidos se omiten y se agregan a `errores` (una lista de
+    `ErrorImportacion`). Si el primero ya es inválido se lanza el error sin
+    guardar nada: casi siempre es un archivo de otro formato.
+    """
+    errores = [] if errores is None else errores
+    totales = {}
+    pendiente = []
+    primero = True
+
+    def vaciar():
+        for clave, valor in guardar_lote(pendiente, errores).items():
+            totales[clave] = totales.get(clave, 0) + valor
+        pendiente.clear()
+
+    for linea, registro in registros:
+        try:
+            pendiente.append((linea, resolver_imagenes(linea, validar(linea, registro), resolver_imagen)))
+        except ErrorImportacion as error:
+            if primero:
+                raise
+            errores.append(error)
+        primero = False
+        if len(pendiente) >= lote:
+            vaciar()
+    if pendiente:
+        vaciar()
+    if errores:
+        totales['errores'] = len(errores)
+    return totales
+
+
+# --- Exportación ---
+
+def productos_para_exportar(lote=500):
+    return Producto.objects.order_by('pk').prefetch_related('variantes').iterator(chunk_size=lote)
+
+
+def registro_jsonl(producto):
+    return {
+        'id': producto.pk,
+        'nombre': producto.nombre,
+        'descripcion': producto.descripcion,
+        'precio': str(producto.precio),
+        'categoria': producto.categoria,
+        'color_principal': producto.color_principal,
+        'imagen_principal': producto.imagen_principal.name or '',
+        'variantes': [
+            {'color': variante.color, 'imagen': variante.imagen.name, 'stock': variante.stock}
+            for variante in sorted(producto.variantes.all(), key=lambda v: v.pk)
+        ],
+    }
+
+
+def filas_csv(producto):
+    base = registro_jsonl(producto)
+    variantes = base.pop('variantes') or [{'color': '', 'imagen': '', 'stock': ''}]
+    for variante in variantes:
+        yield {**base, **variante}
+
+
+def exportar(salida, formato, lote=500):
+    """
+    Escribe el catálogo completo en `salida`. Devuelve cuántos productos escribió.
+    """
+    total = 0
+    if formato == 'csv':
+        escritor = csv.DictWriter(salida, fieldnames=COLUMNAS_CSV)
+        escritor.writeheader()
+        for producto in productos_para_exportar(lote):
+            escritor.writerows(filas_csv(producto))
+            total += 1
+    else:
+        for producto in productos_para_exportar(lote):
+            salida.write(json.dumps(registro_jsonl(producto), ensure_ascii=False) + '\n')
+            total += 1
+    return total
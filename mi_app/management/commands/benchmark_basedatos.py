@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from mi_app.benchmark import compras, servidor_gunicorn
+from mi_app.models import ColorVariante
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide checkouts simultáneos (procesar_pago) bajo gunicorn con la base de datos "
+        "de DATABASE_URL, sin y con los ajustes de `mi_proyecto.basedatos` (WAL y busy "
+        "timeout en SQLite, pool o conexiones persistentes en PostgreSQL). Descuenta "
+        "stock real: úsalo sobre una base de pruebas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compras', type=int, default=300, help="Checkouts por configuración.")
+        parser.add_argument('--concurrencia', type=int, default=16, help="Compradores simultáneos.")
+        parser.add_argument('--variantes', type=int, default=4, help="Variantes que se disputan los compradores.")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--modo', choices=['wsgi', 'asgi'], default='wsgi', help="Modo de gunicorn.")
+        parser.add_argument(
+            '--pool', choices=['persistente', 'psycopg', 'pgbouncer', 'ninguno'],
+            help="DB_POOL para PostgreSQL (por defecto, el del entorno).",
+        )
+
+    def handle(self, *args, **options):
+        variantes = list(
+            ColorVariante.objects.filter(stock__gte=2 * options['compras'])
+            .order_by('pk').values_list('producto_id', 'pk')[:options['variantes']]
+        )
+        if not variantes:
+            raise CommandError("No hay variantes con stock suficiente; ejecuta `manage.py sembrar_catalogo`.")
+
+        entorno = {'RENDIMIENTO_LOG_LEVEL': 'ERROR'}
+        if options['pool']:
+            entorno['DB_POOL'] = options['pool']
+        filas = []
+        for nombre, ajustes in (('sin ajustes', 'False'), ('con ajustes', 'True')):
+            if ajustes == 'False' and connection.vendor == 'sqlite':
+                # WAL queda grabado en el archivo: se vuelve al journal por defecto.
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode=DELETE')
+            connection.close()
+            try:
+                with servidor_gunicorn(options['modo'], options['puerto'], options['workers'],
+                                       {**entorno, 'DB_AJUSTES': ajustes}) as url:
+                    filas.append((nombre, compras(url, variantes, options['compras'], options['concurrencia'])))
+            except RuntimeError as error:
+                raise CommandError(str(error))
+
+        self.stdout.write(
+            f"{settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]} modo={options['modo']} "
+            f"workers={options['workers']} concurrencia={options['concurrencia']} "
+            f"variantes={len(variantes)}"
+        )
+        self.stdout.write(
+            f"{'configuración':<14}{'n':>6}{'ok':>6}{'err':>5}{'sin stock':>10}{'pagos/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        )
+        for nombre, datos in filas:
+            # Solo cuentan los pagos que terminaron en la compra exitosa.
+            pagos = round(datos['ok'] / datos['segundos'], 1) if datos['segundos'] else 0.0
+            self.stdout.write(
+                f"{nombre:<14}{datos['n']:>6}{datos['ok']:>6}{datos['errores']:>5}{datos['sin_stock']:>10}{pagos:>9}"
+                f"{datos['p50_ms']:>9}{datos['p95_ms']:>9}"
+            )
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from mi_app.benchmark import GeminiSimulado, carga, servidor_gunicorn
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara gunicorn con workers síncronos (WSGI) y con workers de uvicorn (ASGI), "
+        "con el mismo número de workers, en los endpoints que esperan E/S: el asistente "
+        "(contra un Gemini simulado con latencia fija) y el contador del carrito."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrencia', type=int, default=50, help="Clientes simultáneos.")
+        parser.add_argument('--peticiones', type=int, default=200, help="Peticiones por endpoint y modo.")
+        parser.add_argument('--latencia-gemini', type=float, default=0.5, help="Segundos por respuesta de Gemini.")
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--modos', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+
+    def handle(self, *args, **options):
+        filas = []
+        with GeminiSimulado(options['latencia_gemini']) as gemini:
+            entorno = {
+                'GEMINI_API_BASE': gemini.url, 'GEMINI_API_KEY': 'benchmark',
+                'RENDIMIENTO_LOG_LEVEL': 'ERROR',
+            }
+            for modo in options['modos']:
+                try:
+                    with servidor_gunicorn(modo, options['puerto'], options['workers'], entorno) as url:
+                        # Una pregunta distinta por petición: ninguna sale de la caché.
+                        chat = carga(
+                            url.rstrip('/') + reverse('get_ai_response'), options['peticiones'],
+                            options['concurrencia'], 'post',
+                            lambda i, modo=modo: {'message': f'Pregunta {modo} {i}'},
+                        )
+                        contador = carga(
+                            url.rstrip('/') + reverse('cart_count'), options['peticiones'] * 5,
+                            options['concurrencia'],
+                        )
+                except RuntimeError as error:
+                    raise CommandError(str(error))
+                filas.append((modo, 'asistente', chat))
+                filas.append((modo, 'cart_count', contador))
+
+        self.stdout.write(
+            f"workers={options['workers']} concurrencia={options['concurrencia']} "
+            f"latencia Gemini={options['latencia_gemini']} s"
+        )
+        self.stdout.write(f"{'modo':<6}{'endpoint':<12}{'n':>6}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}")
+        for modo, endpoint, datos in filas:
+            self.stdout.write(
+                f"{modo:<6}{endpoint:<12}{datos['n']:>6}{datos['errores']:>5}{datos['por_segundo']:>9}"
+                f"{datos['p50_ms']:>9}{datos['p95_ms']:>9}"
+            )
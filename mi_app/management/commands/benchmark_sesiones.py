@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from mi_app.cart import CART_SESSION_KEY
+from mi_app.models import Producto
+
+
+class SesionAnterior:
+    """
+    Reproduce el comportamiento anterior: inicializar el carrito en cada visita.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if CART_SESSION_KEY not in request.session:
+            request.session[CART_SESSION_KEY] = {}
+        return self.get_response(request)
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula visitas anónimas al catálogo y al detalle de producto y cuenta las "
+        "filas de django_session creadas y las escrituras en esa tabla, comparando "
+        "el carrito perezoso con el comportamiento anterior. Todo se deshace al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitas', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        visitas = options['visitas']
+        urls = [reverse('catalogo_publico')]
+        pk = Producto.objects.values_list('pk', flat=True).first()
+        if pk is not None:
+            urls.append(reverse('producto_detalle', args=[pk]))
+
+        anterior = self.medir(visitas, urls, settings.MIDDLEWARE + [f'{__name__}.SesionAnterior'])
+        actual = self.medir(visitas, urls, settings.MIDDLEWARE)
+
+        self.stdout.write(f"Visitas anónimas: {visitas}")
+        for nombre, (filas, escrituras) in (('anterior', anterior), ('actual', actual)):
+            self.stdout.write(f"  {nombre:<9} filas nuevas: {filas:>7}  escrituras: {escrituras:>7}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Ahorro: {anterior[0] - actual[0]} filas y {anterior[1] - actual[1]} escrituras"
+        ))
+
+    def medir(self, visitas, urls, middleware):
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*', '') and not h.startswith('.')), 'localhost')
+        with override_settings(MIDDLEWARE=middleware), transaction.atomic():
+            antes = Session.objects.count()
+            escrituras = 0
+
+            def contar(execute, sql, params, many, context):
+                nonlocal escrituras
+                if 'django_session' in sql and sql.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
+                    escrituras += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(contar):
+                for i in range(visitas):
+                    # Cliente nuevo por visita: sin cookies, como un rastreador.
+                    Client(HTTP_HOST=host).get(urls[i % len(urls)])
+            filas = Session.objects.count() - antes
+            transaction.set_rollback(True)
+        return filas, escrituras
@@ -0,0 +1,91 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mi_app.benchmark import ClienteDjango, ClienteHTTP, comparar, ejecutar, resumen, servidor_gunicorn
+from mi_app.models import ColorVariante
+
+
+class Command(BaseCommand):
+    help = (
+        "Recorre catálogo, detalle, carrito y pago con visitantes virtuales e informa "
+        "p50/p95/p99, consultas y bytes por vista. Sin --url usa el cliente de pruebas "
+        "dentro de una transacción que se deshace; con --url (o --gunicorn) hace "
+        "peticiones HTTP reales en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitantes', type=int, default=200)
+        parser.add_argument('--concurrencia', type=int, default=8, help="Solo en modo HTTP.")
+        parser.add_argument('--url', help="Servidor ya levantado, p. ej. http://127.0.0.1:8000/.")
+        parser.add_argument(
+            '--gunicorn', action='store_true',
+            help="Levanta gunicorn en --puerto durante el benchmark.",
+        )
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=4, help="Workers de gunicorn.")
+        parser.add_argument('--modo', choices=['wsgi', 'asgi'], default='wsgi', help="Modo de gunicorn.")
+        parser.add_argument('--guardar-base', metavar='RUTA', help="Guarda el resultado como línea base.")
+        parser.add_argument('--comparar', metavar='RUTA', help="Compara con una línea base guardada.")
+        parser.add_argument('--tolerancia', type=float, default=0.2, help="Margen relativo (0.2 = 20 %%).")
+
+    def handle(self, *args, **options):
+        variantes = list(
+            ColorVariante.objects.filter(stock__gte=options['visitantes'])
+            .order_by('pk').values_list('producto_id', 'pk')[:500]
+        )
+        if not variantes:
+            raise CommandError("No hay variantes con stock suficiente; ejecuta `manage.py sembrar_catalogo`.")
+
+        if options['gunicorn']:
+            informe = self.con_gunicorn(variantes, options)
+        elif options['url']:
+            informe = self.http(options['url'], variantes, options)
+        else:
+            with transaction.atomic():
+                informe = resumen(ejecutar(ClienteDjango, variantes, options['visitantes']))
+                # Pedidos y stock del recorrido no se conservan.
+                transaction.set_rollback(True)
+
+        self.imprimir(informe)
+
+        if options['guardar_base']:
+            with open(options['guardar_base'], 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo, indent=2, sort_keys=True)
+            self.stdout.write(f"Línea base guardada en {options['guardar_base']}")
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                base = json.load(archivo)
+            regresiones = comparar(informe, base, options['tolerancia'])
+            if regresiones:
+                for regresion in regresiones:
+                    self.stderr.write(f"  {regresion}")
+                raise CommandError(f"Regresiones frente a la línea base: {len(regresiones)}")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones frente a la línea base."))
+
+    def http(self, url, variantes, options):
+        return resumen(ejecutar(
+            lambda: ClienteHTTP(url), variantes, options['visitantes'], options['concurrencia'],
+        ))
+
+    def con_gunicorn(self, variantes, options):
+        # Con todas las peticiones muestreadas, Server-Timing trae las consultas.
+        entorno = {'RENDIMIENTO_MUESTREO': '1', 'RENDIMIENTO_LOG_LEVEL': 'WARNING'}
+        try:
+            with servidor_gunicorn(options['modo'], options['puerto'], options['workers'], entorno) as url:
+                return self.http(url, variantes, options)
+        except RuntimeError as error:
+            raise CommandError(str(error))
+
+    def imprimir(self, informe):
+        self.stdout.write(
+            f"{'vista':<18}{'n':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'consultas':>11}{'bytes':>9}"
+        )
+        for vista, datos in informe.items():
+            consultas = '-' if datos['consultas'] is None else datos['consultas']
+            self.stdout.write(
+                f"{vista:<18}{datos['n']:>6}{datos['errores']:>5}{datos['p50_ms']:>9}"
+                f"{datos['p95_ms']:>9}{datos['p99_ms']:>9}{consultas:>11}{datos['bytes']:>9}"
+            )
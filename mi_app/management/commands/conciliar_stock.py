@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from mi_app.stock import conciliar_stock
+
+
+class Command(BaseCommand):
+    help = "Comprueba que Producto.stock_total coincida con la suma de sus variantes y corrige los desvíos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Productos por consulta.")
+        parser.add_argument('--dry-run', action='store_true', help="Solo informa, no corrige.")
+
+    def handle(self, *args, **options):
+        desvios = conciliar_stock(options['lote'], corregir=not options['dry_run'])
+        for pk, guardado, real in desvios:
+            self.stdout.write(f"Producto {pk}: stock_total {guardado}, real {real}")
+        accion = "detectados" if options['dry_run'] else "corregidos"
+        self.stdout.write(f"Desvíos {accion}: {len(desvios)}")
@@ -0,0 +1,29 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from mi_app.estaticos import ErrorEstaticos, construir
+
+
+class Command(BaseCommand):
+    help = (
+        "Compila la hoja de estilos de la tienda (Tailwind, solo las clases usadas en "
+        "las plantillas) y recorta las fuentes de iconos a los iconos usados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tailwind', help="Ruta de la CLI de Tailwind (por defecto, la del PATH).")
+        parser.add_argument(
+            '--collectstatic', action='store_true',
+            help="Ejecuta después collectstatic para dejarlos en STATIC_ROOT con hash y comprimidos.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            escritos = construir(tailwind=options['tailwind'])
+        except ErrorEstaticos as error:
+            raise CommandError(str(error))
+        for ruta, tamano in escritos.items():
+            self.stdout.write(f"{ruta}: {tamano / 1024:.1f} KiB")
+        if options['collectstatic']:
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.stdout.write("Archivos copiados a STATIC_ROOT.")
@@ -0,0 +1,88 @@
+import os
+import posixpath
+import re
+import shutil
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mi_app.models import Producto, ColorVariante, TareaImagen
+from mi_app.recoleccion import almacenamiento, borrar_archivo, recolectar_huerfanos
+from mi_app.storage import hash_contenido, nombre_por_contenido
+from mi_app.tareas import encolar_imagen
+
+NOMBRE_HASH = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Deduplica en el sitio las imágenes existentes: renombra cada archivo por "
+        "su hash de contenido, borra las copias idénticas y actualiza la base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carpeta', default='productos', help="Carpeta dentro de MEDIA_ROOT.")
+        parser.add_argument('--dry-run', action='store_true', help="Solo muestra lo que se haría.")
+        parser.add_argument(
+            '--purgar-huerfanos', action='store_true',
+            help="Borra además los archivos que ninguna fila referencia.",
+        )
+
+    def handle(self, *args, **options):
+        storage = almacenamiento()
+        carpeta = options['carpeta']
+        _, archivos = storage.listdir(carpeta)
+
+        # nombre actual -> nombre por contenido
+        renombres = {}
+        bytes_ahorrados = 0
+        for archivo in sorted(archivos):
+            if NOMBRE_HASH.match(archivo):
+                continue
+            nombre = posixpath.join(carpeta, archivo)
+            with storage.open(nombre, 'rb') as f:
+                destino = nombre_por_contenido(nombre, hash_contenido(File(f)))
+            if destino in renombres.values() or storage.exists(destino):
+                bytes_ahorrados += storage.size(nombre)
+            renombres[nombre] = destino
+
+        self.stdout.write(
+            f"Archivos a renombrar: {len(renombres)}, "
+            f"destinos únicos: {len(set(renombres.values()))}, "
+            f"bytes ahorrados: {bytes_ahorrados}"
+        )
+        if options['dry_run']:
+            for nombre, destino in renombres.items():
+                self.stdout.write(f"  {nombre} -> {destino}")
+            return
+
+        # 1. Crear cada destino (enlace duro si es posible) sin tocar los originales.
+        for nombre, destino in renombres.items():
+            if not storage.exists(destino):
+                try:
+                    os.link(storage.path(nombre), storage.path(destino))
+                except OSError:
+                    shutil.copyfile(storage.path(nombre), storage.path(destino))
+
+        # 2. Apuntar las filas a los nuevos nombres en una sola transacción.
+        with transaction.atomic():
+            for nombre, destino in renombres.items():
+                Producto.objects.filter(imagen_principal=nombre).update(imagen_principal=destino)
+                ColorVariante.objects.filter(imagen=nombre).update(imagen=destino)
+                TareaImagen.objects.filter(archivo=nombre).delete()
+            for destino in set(renombres.values()):
+                encolar_imagen(File(None, destino))
+
+        # 3. Borrar los nombres antiguos y sus derivados.
+        for nombre in renombres:
+            borrar_archivo(nombre, storage)
+
+        eliminados = []
+        if options['purgar_huerfanos']:
+            _, archivos = storage.listdir(carpeta)
+            eliminados = recolectar_huerfanos(posixpath.join(carpeta, a) for a in archivos)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deduplicación completada. Huérfanos eliminados: {len(eliminados)}"
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_app.reservas import expirar
+
+
+class Command(BaseCommand):
+    help = "Borra por lotes las reservas de stock vencidas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Reservas por DELETE.")
+        parser.add_argument(
+            '--intervalo', type=float, default=None,
+            help="Si se indica, repite el barrido cada tantos segundos.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            borradas = expirar(options['lote'])
+            self.stdout.write(f"Reservas vencidas borradas: {borradas}")
+            if options['intervalo'] is None:
+                break
+            time.sleep(options['intervalo'])
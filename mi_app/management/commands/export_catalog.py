@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from mi_app.importacion import exportar
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el catálogo a CSV (una fila por variante) o JSONL (un producto por línea) "
+        "en streaming, en el formato que lee `import_catalog`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', default='-', help="Ruta de salida, o - para la salida estándar.")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help="Por defecto, según la extensión.")
+        parser.add_argument('--lote', type=int, default=500, help="Productos leídos por consulta.")
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or ('csv' if ruta.lower().endswith('.csv') else 'jsonl')
+        if ruta == '-':
+            exportar(self.stdout, formato, options['lote'])
+            return
+        with open(ruta, 'w', encoding='utf-8', newline='') as salida:
+            total = exportar(salida, formato, options['lote'])
+        self.stderr.write(f"Productos exportados: {total}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from mi_app.imagenes import generar_derivados
+from mi_app.models import Producto, ColorVariante
+
+
+class Command(BaseCommand):
+    help = "Genera los derivados WebP/JPEG de las imágenes ya subidas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help="Regenera los derivados aunque ya existan.",
+        )
+
+    def handle(self, *args, **options):
+        archivos = [p.imagen_principal for p in Producto.objects.exclude(imagen_principal='')]
+        archivos += [v.imagen for v in ColorVariante.objects.exclude(imagen='')]
+
+        total = 0
+        for field_file in archivos:
+            try:
+                total += len(generar_derivados(field_file, forzar=options['forzar']))
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"No se pudo procesar {field_file.name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Derivados escritos: {total}"))
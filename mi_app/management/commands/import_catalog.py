@@ -0,0 +1,53 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mi_app.importacion import (
+    ErrorImportacion, ResolutorImagenes, encolar_subidas, importar, leer_csv, leer_jsonl,
+)
+from mi_app.recoleccion import almacenamiento
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos y variantes desde un CSV o JSONL (ver mi_app/importacion.py), "
+        "por lotes y en streaming. Crea lo nuevo y actualiza lo existente; el stock se reemplaza. "
+        "Los registros inválidos se omiten y se listan al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo, o - para leer de la entrada estándar.")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help="Por defecto, según la extensión.")
+        parser.add_argument('--imagenes', help="Carpeta donde buscar las imágenes con ruta relativa.")
+        parser.add_argument('--lote', type=int, default=500, help="Productos por transacción.")
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or ('csv' if ruta.lower().endswith('.csv') else 'jsonl')
+        if ruta == '-':
+            archivo = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        else:
+            archivo = open(ruta, encoding='utf-8', newline='')
+
+        resolutor = ResolutorImagenes(almacenamiento(), options['imagenes'])
+        leer = leer_csv if formato == 'csv' else leer_jsonl
+        errores = []
+        try:
+            with archivo:
+                totales = importar(leer(archivo), resolutor, options['lote'], errores)
+        except ErrorImportacion as error:
+            # Cabecera o primer registro inválidos: no se guardó nada.
+            raise CommandError(f"{error}. ¿Es un {formato.upper()} del catálogo? No se importó nada.")
+        finally:
+            # Las imágenes subidas se procesan aunque la importación se corte.
+            encolar_subidas(resolutor.subidas)
+
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{clave.replace('_', ' ')}: {valor}" for clave, valor in totales.items())
+            or "Archivo vacío."
+        ))
+        if resolutor.subidas:
+            self.stdout.write(f"Imágenes nuevas encoladas: {len(resolutor.subidas)}")
+        for error in errores:
+            self.stderr.write(f"Omitido. {error}")
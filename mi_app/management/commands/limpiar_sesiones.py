@@ -0,0 +1,63 @@
+from functools import reduce
+from operator import or_
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from mi_app.cart import CART_KEYS, CART_SESSION_KEY
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las sesiones caducadas y las que solo contienen un carrito vacío "
+        "(creadas por visitantes anónimos), y quita el carrito vacío de las demás."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Solo muestra lo que se haría.")
+        parser.add_argument('--lote', type=int, default=1000, help="Sesiones por lote.")
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            call_command('clearsessions')
+
+        # {session_key: session_data leída}: las escrituras solo tocan las filas
+        # que no cambiaron desde la lectura (un visitante pudo agregar algo al
+        # carrito mientras tanto).
+        borrar, compactar = {}, {}
+        sesiones = Session.objects.only('session_key', 'session_data').iterator(chunk_size=options['lote'])
+        for sesion in sesiones:
+            datos = sesion.get_decoded()
+            if CART_SESSION_KEY not in datos or datos[CART_SESSION_KEY]:
+                continue
+            resto = {k: v for k, v in datos.items() if k not in CART_KEYS}
+            if resto:
+                compactar[sesion.session_key] = (sesion.session_data, resto)
+            else:
+                borrar[sesion.session_key] = sesion.session_data
+
+        self.stdout.write(f"Sesiones con carrito vacío a borrar: {len(borrar)}, a compactar: {len(compactar)}")
+        if options['dry_run']:
+            return
+
+        lote = options['lote']
+        claves = list(borrar)
+        borradas = compactadas = 0
+        with transaction.atomic():
+            for i in range(0, len(claves), lote):
+                sin_cambios = reduce(or_, (
+                    Q(session_key=clave, session_data=borrar[clave]) for clave in claves[i:i + lote]
+                ))
+                borradas += Session.objects.filter(sin_cambios).delete()[0]
+            for session_key, (leida, datos) in compactar.items():
+                compactadas += Session.objects.filter(session_key=session_key, session_data=leida).update(
+                    session_data=Session.objects.encode(datos)
+                )
+        omitidas = len(borrar) + len(compactar) - borradas - compactadas
+        self.stdout.write(self.style.SUCCESS(
+            f"Limpieza completada. Borradas: {borradas}, compactadas: {compactadas}, "
+            f"omitidas por cambiar durante la limpieza: {omitidas}."
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_app.tareas import ejecutar_tarea, liberar_bloqueadas, reclamar_siguiente
+
+
+class Command(BaseCommand):
+    help = "Worker que procesa la cola de tareas de imagen guardada en la base de datos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help="Procesa las tareas pendientes y termina.",
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=2.0,
+            help="Segundos de espera cuando la cola está vacía.",
+        )
+
+    def handle(self, *args, **options):
+        liberadas = liberar_bloqueadas()
+        if liberadas:
+            self.stdout.write(f"Tareas bloqueadas devueltas a la cola: {liberadas}")
+
+        while True:
+            tarea = reclamar_siguiente()
+            if tarea is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            if ejecutar_tarea(tarea):
+                self.stdout.write(f"Procesada: {tarea.archivo}")
+            else:
+                self.stderr.write(f"Falló: {tarea.archivo} ({tarea.error})")
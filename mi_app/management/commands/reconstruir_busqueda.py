@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mi_app import busqueda
+from mi_app.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de texto completo de productos."
+
+    def handle(self, *args, **options):
+        if busqueda.motor() is None:
+            self.stdout.write("El motor de base de datos no tiene índice de texto completo; nada que hacer.")
+            return
+        with transaction.atomic():
+            total = busqueda.reconstruir(Producto.objects.prefetch_related('variantes').iterator(chunk_size=500))
+        self.stdout.write(self.style.SUCCESS(f"Productos indexados: {total}"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mi_app.benchmark import sembrar
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea un catálogo sintético para el benchmark: muchos productos, varias "
+        "variantes por producto e imágenes PNG del tamaño de las subidas reales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=2000)
+        parser.add_argument('--variantes', type=int, default=4, help="Variantes por producto.")
+        parser.add_argument('--imagenes', type=int, default=8, help="Imágenes distintas a repartir.")
+        parser.add_argument('--stock', type=int, default=1000, help="Stock de cada variante.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            imagenes = sembrar(
+                options['productos'], options['variantes'], options['imagenes'], options['stock'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Productos creados: {options['productos']}, "
+            f"variantes: {options['productos'] * options['variantes']}, "
+            f"imágenes distintas: {len(set(imagenes))}"
+        ))
+        self.stdout.write("Los derivados se generan con `manage.py generar_derivados`.")
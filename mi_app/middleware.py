@@ -0,0 +1,304 @@
+# mi_app/middleware.py
+
+import json
+import logging
+import os
+import random
+import re
+import time
+from urllib.parse import urlparse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+from whitenoise.string_utils import ensure_leading_trailing_slash
+
+from . import rendimiento, replicas
+from .cart import CART_COOKIE_NAME, CART_COOKIE_SALT, CART_SESSION_KEY, serializar_cookie
+
+logger = logging.getLogger('mi_app.rendimiento')
+
+# Nombres que pone `AlmacenamientoPorContenido` (`productos/<sha256>.png`) y los
+# de sus derivados (`derivados/productos/<sha256>-320.webp`): su contenido no
+# cambia nunca.
+NOMBRE_POR_CONTENIDO = re.compile(r'/(?P<hash>[0-9a-f]{64})(?P<ancho>-\d+)?\.[^/]+$')
+
+
+class AsincronoMixin:
+    """
+    Middleware que funciona igual bajo WSGI y ASGI: si el siguiente eslabón es
+    asíncrono, `__call__` delega en `__acall__` y Django no tiene que pasar la
+    petición por un hilo (`async_to_sync`) en este punto de la cadena.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+
+class WhiteNoiseAsincronoMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise solo es síncrono; en la cadena ASGI obligaría a Django a servir
+    cada petición desde un hilo. Esta versión atiende los estáticos en un hilo
+    y deja pasar el resto de peticiones sin salir del bucle de eventos.
+
+    También sirve MEDIA_ROOT (con `SERVIR_MEDIA`), que cambia en cada subida y
+    por eso se busca en disco en cada petición en lugar de indexarse al
+    arrancar. Las imágenes con nombre por contenido se marcan `immutable` con
+    su hash como ETag; el resto se cachea `MEDIA_MAX_AGE` segundos y se
+    revalida con ETag. WhiteNoise se encarga de `If-None-Match`, `Range`, las
+    variantes `.gz`/`.br` y de entregar el archivo como FileResponse, que
+    gunicorn envía con `sendfile`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        # Antes de super(): al indexar STATIC_ROOT ya se usa `add_cache_headers`.
+        self.media_prefix = None
+        if settings.SERVIR_MEDIA and settings.MEDIA_URL and settings.MEDIA_ROOT:
+            self.media_prefix = ensure_leading_trailing_slash(urlparse(settings.MEDIA_URL).path)
+            self.media_root = os.path.join(os.path.abspath(settings.MEDIA_ROOT), '')
+        self.media_max_age = settings.MEDIA_MAX_AGE
+
+        super().__init__(get_response, settings)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def es_media(self, url):
+        return self.media_prefix is not None and url.startswith(self.media_prefix)
+
+    def find_media(self, url):
+        """
+        Archivo de MEDIA_ROOT para `url`, o None si no existe.
+        """
+        if not self.url_is_canonical(url):
+            return None
+        path = os.path.join(self.media_root, url[len(self.media_prefix):])
+        if os.path.commonprefix((self.media_root, path)) != self.media_root:
+            return None
+        try:
+            return self.find_file_at_path(path, url)
+        except MissingFileError:
+            return None
+
+    def add_cache_headers(self, headers, path, url):
+        if not self.es_media(url):
+            return super().add_cache_headers(headers, path, url)
+        por_contenido = NOMBRE_POR_CONTENIDO.search(url)
+        if por_contenido:
+            headers['Cache-Control'] = f'max-age={self.FOREVER}, public, immutable'
+            if not por_contenido['ancho']:
+                # El nombre ya es el SHA-256 del archivo: un ETag fuerte que no
+                # depende de la fecha de modificación.
+                headers['ETag'] = f'"{por_contenido["hash"]}"'
+        elif self.media_max_age is not None:
+            headers['Cache-Control'] = f'max-age={self.media_max_age}, public'
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if self.es_media(request.path_info):
+            media_file = self.find_media(request.path_info)
+            if media_file is not None:
+                return self.serve(media_file, request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.es_media(request.path_info):
+            static_file = await sync_to_async(self.find_media, thread_sensitive=False)(request.path_info)
+        elif self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+class CartCookieMiddleware(AsincronoMixin):
+    """
+    Guarda el carrito en una cookie firmada cuando `CART_STORAGE = 'cookie'`.
+
+    Solo escribe la cookie si el carrito cambió durante la petición. Si el carrito
+    serializado supera `CART_COOKIE_MAX_BYTES`, se copia a la sesión (creándola
+    en ese momento) y se borra la cookie.
+    """
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        grande = self.guardar_cookie(request, response)
+        if grande is not None:
+            # La sesión se guarda después, en la salida de SessionMiddleware.
+            request.session.update(grande)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        grande = self.guardar_cookie(request, response)
+        if grande is not None:
+            await request.session.aupdate(grande)
+        return response
+
+    def guardar_cookie(self, request, response):
+        """
+        Escribe o borra la cookie. Devuelve el carrito si es demasiado grande
+        para la cookie y hay que pasarlo a la sesión.
+        """
+        store = getattr(request, 'cart_cookie', None)
+        if store is None or not store.modified:
+            return None
+
+        if not store.get(CART_SESSION_KEY):
+            response.delete_cookie(CART_COOKIE_NAME)
+            return None
+
+        valor = serializar_cookie(store)
+        if len(valor.encode('utf-8')) > settings.CART_COOKIE_MAX_BYTES:
+            response.delete_cookie(CART_COOKIE_NAME)
+            return store
+        response.set_signed_cookie(
+            CART_COOKIE_NAME, valor, salt=CART_COOKIE_SALT,
+            max_age=settings.SESSION_COOKIE_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True, samesite='Lax',
+        )
+        return None
+
+
+class ReplicaMiddleware(AsincronoMixin):
+    """
+    Decide si la petición puede leer el catálogo de la réplica (ver
+    `mi_app.replicas`). Las peticiones POST, y las que llegan con la cookie
+    `COOKIE_PRIMARIA`, leen de la primaria; si la petición escribe, la cookie
+    se renueva para que las siguientes también lo hagan mientras la réplica se
+    pone al día. Sin `RouterReplica` en DATABASE_ROUTERS no se instala.
+    """
+
+    METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not replicas.activa():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        token = replicas.iniciar(self.fijada(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            estado = replicas.terminar(token)
+        return self.recordar(estado, response)
+
+    async def __acall__(self, request):
+        token = replicas.iniciar(self.fijada(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            estado = replicas.terminar(token)
+        return self.recordar(estado, response)
+
+    def fijada(self, request):
+        return request.method not in self.METODOS_SEGUROS or replicas.COOKIE_PRIMARIA in request.COOKIES
+
+    def recordar(self, estado, response):
+        if estado.escribio:
+            response.set_cookie(
+                replicas.COOKIE_PRIMARIA, '1', max_age=settings.REPLICA_FIJAR_SEGUNDOS,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class RendimientoMiddleware(AsincronoMixin):
+    """
+    Mide dónde se va el tiempo de cada petición: consultas SQL (número y
+    tiempo), render de plantillas, carga/guardado de sesión y llamadas a Gemini.
+
+    Una fracción `RENDIMIENTO_MUESTREO` de las peticiones se instrumenta, recibe
+    la cabecera `Server-Timing` y deja una línea JSON en el log
+    `mi_app.rendimiento`. Las peticiones más lentas que `RENDIMIENTO_LENTO_MS`
+    se registran siempre (como WARNING), aunque no estén muestreadas.
+
+    Debe ir antes de SessionMiddleware para incluir el guardado de la sesión.
+    """
+
+    TRAMOS = ('db', 'plantilla', 'sesion', 'gemini')
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        rendimiento.instrumentar()
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        if random.random() >= settings.RENDIMIENTO_MUESTREO:
+            return self.sin_muestrear(request, self.get_response(request), inicio)
+
+        medicion, token = rendimiento.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            rendimiento.terminar(token)
+        return self.muestreada(request, response, inicio, medicion)
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        if random.random() >= settings.RENDIMIENTO_MUESTREO:
+            return self.sin_muestrear(request, await self.get_response(request), inicio)
+
+        medicion, token = rendimiento.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            rendimiento.terminar(token)
+        return self.muestreada(request, response, inicio, medicion)
+
+    def sin_muestrear(self, request, response, inicio):
+        total_ms = (time.perf_counter() - inicio) * 1000
+        if total_ms >= settings.RENDIMIENTO_LENTO_MS:
+            self.registrar(request, response, total_ms, None)
+        return response
+
+    def muestreada(self, request, response, inicio, medicion):
+        total_ms = (time.perf_counter() - inicio) * 1000
+        response['Server-Timing'] = self.server_timing(medicion, total_ms)
+        self.registrar(request, response, total_ms, medicion)
+        return response
+
+    def server_timing(self, medicion, total_ms):
+        partes = []
+        for tramo in self.TRAMOS:
+            if tramo in medicion.tiempos:
+                partes.append(f'{tramo};dur={medicion.ms(tramo)};desc="{medicion.llamadas[tramo]}"')
+        partes.append(f'total;dur={round(total_ms, 2)}')
+        return ', '.join(partes)
+
+    def registrar(self, request, response, total_ms, medicion):
+        match = getattr(request, 'resolver_match', None)
+        datos = {
+            'vista': match.view_name if match else None,
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'total_ms': round(total_ms, 2),
+        }
+        if medicion is not None:
+            datos['consultas'] = medicion.llamadas.get('db', 0)
+            for tramo in self.TRAMOS:
+                datos[f'{tramo}_ms'] = medicion.ms(tramo)
+        lenta = total_ms >= settings.RENDIMIENTO_LENTO_MS
+        datos['lenta'] = lenta
+        logger.log(logging.WARNING if lenta else logging.INFO, json.dumps(datos, ensure_ascii=False))
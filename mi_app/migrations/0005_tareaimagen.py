@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0004_producto_categoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=255, unique=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completada', 'Completada'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('placeholder', models.TextField(blank=True)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('actualizada', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'creada'], name='mi_app_tare_estado_d17c4b_idx')],
+            },
+        ),
+    ]
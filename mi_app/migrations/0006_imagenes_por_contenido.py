@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:54
+
+import mi_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0005_tareaimagen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='colorvariante',
+            name='imagen',
+            field=models.ImageField(storage=mi_app.storage.AlmacenamientoPorContenido(), upload_to='productos/'),
+        ),
+        migrations.AlterField(
+            model_name='producto',
+            name='imagen_principal',
+            field=models.ImageField(blank=True, null=True, storage=mi_app.storage.AlmacenamientoPorContenido(), upload_to='productos/'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0006_imagenes_por_contenido'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['categoria', 'id'], name='producto_categoria_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['color_principal', 'id'], name='producto_color_id_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from mi_app import busqueda
+
+
+def crear_indice(apps, schema_editor):
+    busqueda.crear_indice(schema_editor.connection)
+    Producto = apps.get_model('mi_app', 'Producto')
+    busqueda.reconstruir(Producto.objects.prefetch_related('variantes'), schema_editor.connection)
+
+
+def eliminar_indice(apps, schema_editor):
+    busqueda.eliminar_indice(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0007_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
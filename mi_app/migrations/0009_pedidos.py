@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0008_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200)),
+                ('dni', models.CharField(blank=True, max_length=20)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('celular', models.CharField(blank=True, max_length=20)),
+                ('ciudad', models.CharField(blank=True, max_length=50)),
+                ('direccion', models.CharField(blank=True, max_length=255)),
+                ('metodo_pago', models.CharField(blank=True, max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('unidades', models.PositiveIntegerField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-creado'], name='pedido_creado_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200)),
+                ('color', models.CharField(max_length=50)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('producto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lineas_pedido', to='mi_app.producto')),
+                ('variante', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lineas_pedido', to='mi_app.colorvariante')),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='mi_app.pedido')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'cantidad'], name='lineapedido_producto_idx'), models.Index(fields=['variante', 'cantidad'], name='lineapedido_variante_idx')],
+            },
+        ),
+    ]
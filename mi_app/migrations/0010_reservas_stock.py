@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0009_pedidos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('expira', models.DateTimeField()),
+                ('variante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='mi_app.colorvariante')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['variante', 'expira'], name='reserva_variante_expira_idx'), models.Index(fields=['expira'], name='reserva_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('clave', 'variante'), name='reserva_clave_variante_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0010_reservas_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AjusteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_anterior', models.IntegerField()),
+                ('stock_nuevo', models.IntegerField()),
+                ('motivo', models.CharField(blank=True, max_length=200)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('variante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ajustes', to='mi_app.colorvariante')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['variante', '-creado'], name='ajuste_variante_creado_idx'), models.Index(fields=['-creado'], name='ajuste_creado_idx')],
+            },
+        ),
+    ]
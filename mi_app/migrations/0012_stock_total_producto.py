@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:33
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_stock_total(apps, schema_editor):
+    Producto = apps.get_model('mi_app', 'Producto')
+    ColorVariante = apps.get_model('mi_app', 'ColorVariante')
+    variantes = ColorVariante.objects.filter(producto=OuterRef('pk'))
+    Producto.objects.update(
+        stock_total=Coalesce(Subquery(
+            variantes.order_by().values('producto').annotate(total=Sum('stock')).values('total')
+        ), Value(0)),
+        en_stock=Exists(variantes.filter(stock__gt=0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0011_ajustes_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='en_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='stock_total',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['en_stock', 'id'], name='producto_en_stock_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-stock_total', 'id'], name='producto_stock_total_id_idx'),
+        ),
+        migrations.RunPython(calcular_stock_total, migrations.RunPython.noop),
+    ]
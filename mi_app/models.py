@@ -1,4 +1,38 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .storage import AlmacenamientoPorContenido
+
+
+class ProductoQuerySet(models.QuerySet):
+    """
+    Consultas reutilizables del catálogo.
+    El stock total se guarda en `Producto.stock_total`; `con_stock` lo recalcula
+    desde las variantes y solo lo usa la conciliación (`conciliar_stock`).
+    """
+
+    def con_stock(self):
+        # Calcula el stock total real en la base de datos con un solo agregado.
+        return self.annotate(stock_anotado=Coalesce(Sum('variantes__stock'), Value(0)))
+
+    def disponibles(self):
+        # Usa el índice (en_stock, id): no recorre las variantes.
+        return self.filter(en_stock=True)
+
+    def con_variantes(self):
+        # Ordenamos por pk para que `variantes.first` use la caché del prefetch.
+        return self.prefetch_related(
+            Prefetch('variantes', queryset=ColorVariante.objects.order_by('pk'))
+        )
+
+    def catalogo(self):
+        """
+        Productos listos para renderizar, con las variantes precargadas.
+        """
+        return self.con_variantes()
+
 
 class Producto(models.Model):
     COLORES_CHOICES = [
@@ -19,11 +53,29 @@ class Producto(models.Model):
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     categoria = models.CharField(max_length=50, choices=CATEGORIAS_CHOICES, default='lenceria')
     color_principal = models.CharField(max_length=50, choices=COLORES_CHOICES, default='red')
-    imagen_principal = models.ImageField(upload_to='productos/', blank=True, null=True)
+    imagen_principal = models.ImageField(
+        upload_to='productos/', storage=AlmacenamientoPorContenido(), blank=True, null=True,
+    )
+    # Suma del stock de las variantes, mantenida por `stock.py` y las señales de
+    # ColorVariante; `manage.py conciliar_stock` corrige cualquier desvío.
+    stock_total = models.IntegerField(default=0, editable=False)
+    en_stock = models.BooleanField(default=False, editable=False)
+
+    objects = ProductoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Filtros del catálogo combinados con la paginación por pk.
+            models.Index(fields=['categoria', 'id'], name='producto_categoria_id_idx'),
+            models.Index(fields=['color_principal', 'id'], name='producto_color_id_idx'),
+            # "Ocultar agotados" y "ordenar por disponibilidad" con paginación por cursor.
+            models.Index(fields=['en_stock', 'id'], name='producto_en_stock_id_idx'),
+            models.Index(fields=['-stock_total', 'id'], name='producto_stock_total_id_idx'),
+        ]
 
     @property
     def total_stock(self):
-        return sum(variant.stock for variant in self.variantes.all())
+        return self.stock_total
 
     def __str__(self):
         return self.nombre
@@ -31,8 +83,145 @@ class Producto(models.Model):
 class ColorVariante(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='variantes')
     color = models.CharField(max_length=50, choices=Producto.COLORES_CHOICES)
-    imagen = models.ImageField(upload_to='productos/')
+    imagen = models.ImageField(upload_to='productos/', storage=AlmacenamientoPorContenido())
     stock = models.IntegerField(default=0)
 
     def __str__(self):
         return f"{self.producto.nombre} - {self.color}"
+
+
+class AjusteStock(models.Model):
+    """
+    Registro de auditoría de cada cambio manual de stock (reposición, inventario).
+    """
+    variante = models.ForeignKey(ColorVariante, on_delete=models.CASCADE, related_name='ajustes')
+    stock_anterior = models.IntegerField()
+    stock_nuevo = models.IntegerField()
+    motivo = models.CharField(max_length=200, blank=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['variante', '-creado'], name='ajuste_variante_creado_idx'),
+            models.Index(fields=['-creado'], name='ajuste_creado_idx'),
+        ]
+
+    @property
+    def diferencia(self):
+        return self.stock_nuevo - self.stock_anterior
+
+    def __str__(self):
+        return f"{self.variante_id}: {self.stock_anterior} -> {self.stock_nuevo}"
+
+
+class ReservaStock(models.Model):
+    """
+    Unidades apartadas por un checkout en curso hasta `expira`.
+    `clave` identifica al comprador (la clave de su sesión). Disponible =
+    stock - reservas vigentes de otros compradores.
+    """
+    clave = models.CharField(max_length=64)
+    variante = models.ForeignKey(ColorVariante, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    expira = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['clave', 'variante'], name='reserva_clave_variante_uniq'),
+        ]
+        indexes = [
+            # Suma de reservas vigentes por variante (`expira > ahora`).
+            models.Index(fields=['variante', 'expira'], name='reserva_variante_expira_idx'),
+            # Barrido de reservas vencidas.
+            models.Index(fields=['expira'], name='reserva_expira_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.variante_id} hasta {self.expira:%H:%M:%S}"
+
+
+class TareaImagen(models.Model):
+    """
+    Cola de trabajos en base de datos para el procesamiento de imágenes subidas.
+    La consume el comando `manage.py procesar_tareas`, sin broker externo.
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADA = 'completada'
+    ERROR = 'error'
+    ESTADOS_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (COMPLETADA, 'Completada'),
+        (ERROR, 'Error'),
+    ]
+
+    archivo = models.CharField(max_length=255, unique=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS_CHOICES, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    placeholder = models.TextField(blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['estado', 'creada'])]
+
+    def __str__(self):
+        return f"{self.archivo} ({self.get_estado_display()})"
+
+
+class Pedido(models.Model):
+    """
+    Compra confirmada en `procesar_pago`, con los datos de envío del formulario.
+    `total` y `unidades` se copian del carrito para listar pedidos sin sumar líneas.
+    """
+    nombre = models.CharField(max_length=200)
+    dni = models.CharField(max_length=20, blank=True)
+    email = models.EmailField(blank=True)
+    celular = models.CharField(max_length=20, blank=True)
+    ciudad = models.CharField(max_length=50, blank=True)
+    direccion = models.CharField(max_length=255, blank=True)
+    metodo_pago = models.CharField(max_length=20, blank=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    unidades = models.PositiveIntegerField()
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # "Pedidos recientes" del panel de control.
+            models.Index(fields=['-creado'], name='pedido_creado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pedido #{self.pk} - {self.nombre}"
+
+
+class LineaPedido(models.Model):
+    """
+    Línea de un pedido. Precio, nombre y color se copian del carrito: el pedido
+    no cambia aunque luego se modifique o se borre el producto.
+    """
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, related_name='lineas_pedido')
+    variante = models.ForeignKey(ColorVariante, on_delete=models.SET_NULL, null=True, related_name='lineas_pedido')
+    nombre = models.CharField(max_length=200)
+    color = models.CharField(max_length=50)
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            # Ventas por producto y por variante (agregados sobre cantidad).
+            models.Index(fields=['producto', 'cantidad'], name='lineapedido_producto_idx'),
+            models.Index(fields=['variante', 'cantidad'], name='lineapedido_variante_idx'),
+        ]
+
+    @property
+    def subtotal(self):
+        return self.precio * self.cantidad
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.nombre} ({self.color})"
@@ -0,0 +1,69 @@
+# mi_app/pedidos.py
+
+"""
+Registro de pedidos en el checkout.
+
+El pedido, sus líneas y el descuento de stock van en la misma transacción: si
+alguna variante no alcanza no queda ni el pedido ni el stock descontado. Las
+líneas se insertan con un único `bulk_create`, así el número de consultas no
+crece con el tamaño del carrito (salvo los UPDATE de stock, uno por línea).
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+
+from .cart import revisar_items
+from .models import LineaPedido, Pedido
+from .stock import StockInsuficiente, cantidades_del_carrito, descontar_stock
+
+# Campos del formulario de checkout que se guardan en el pedido.
+CAMPOS_ENVIO = ('nombre', 'dni', 'email', 'celular', 'ciudad', 'direccion', 'metodo_pago')
+
+
+def lineas_del_carrito(cart):
+    """
+    Líneas sin guardar con los datos del carrito revalidados contra la base
+    (una consulta). Lanza `StockInsuficiente` si alguna variante ya no existe.
+    """
+    lineas = []
+    for linea in revisar_items(cart.items):
+        if not linea['disponible']:
+            raise StockInsuficiente(int(linea['id']))
+        lineas.append(LineaPedido(
+            producto_id=linea['product_id'],
+            variante_id=int(linea['id']),
+            nombre=linea['name'],
+            color=linea['color'],
+            precio=linea['price'],
+            cantidad=int(linea['quantity']),
+        ))
+    return lineas
+
+
+def datos_envio(datos):
+    # Se recortan al largo de cada columna: el formulario no valida longitudes.
+    return {
+        campo: datos.get(campo, '')[:Pedido._meta.get_field(campo).max_length]
+        for campo in CAMPOS_ENVIO
+    }
+
+
+def registrar_pedido(cart, datos, clave=None):
+    """
+    Descuenta el stock y guarda el pedido con sus líneas.
+    `datos` es el POST del checkout y `clave` la del comprador, cuyas reservas
+    se consumen. Lanza `StockInsuficiente` sin guardar nada.
+    """
+    with transaction.atomic():
+        lineas = lineas_del_carrito(cart)
+        descontar_stock(cantidades_del_carrito(cart), clave)
+        pedido = Pedido.objects.create(
+            **datos_envio(datos),
+            total=sum((linea.subtotal for linea in lineas), Decimal('0')),
+            unidades=sum(linea.cantidad for linea in lineas),
+        )
+        for linea in lineas:
+            linea.pedido = pedido
+        LineaPedido.objects.bulk_create(lineas)
+    return pedido
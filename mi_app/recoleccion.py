@@ -0,0 +1,103 @@
+# mi_app/recoleccion.py
+
+"""
+Conteo de referencias y recolección de imágenes huérfanas.
+
+Con el almacenamiento por contenido un mismo archivo puede estar referenciado
+por varios productos y variantes; solo se borra cuando su conteo llega a cero.
+
+Carrera con las subidas: una subida del mismo contenido encuentra el archivo,
+lo reutiliza sin escribirlo y guarda su fila después. Para no dejar esa fila
+apuntando a un archivo borrado:
+
+* la subida que reutiliza un archivo le actualiza la fecha de modificación
+  (`AlmacenamientoPorContenido.save`) y, si ya no existe, lo vuelve a escribir;
+* la recolección mueve primero el archivo a un nombre temporal (ya no se puede
+  reutilizar) y solo lo borra si no se usó en los últimos
+  `RECOLECCION_GRACIA` segundos; si no, lo devuelve a su sitio.
+
+Lo que queda por eso (imágenes recién subidas y reemplazadas enseguida) lo
+borra `manage.py deduplicar_media --purgar-huerfanos`.
+"""
+
+import os
+import time
+
+from django.conf import settings
+
+from .imagenes import ANCHOS_DERIVADOS, FORMATOS_DERIVADOS, nombre_derivado
+from .models import Producto, ColorVariante, TareaImagen
+
+
+def almacenamiento():
+    return Producto._meta.get_field('imagen_principal').storage
+
+
+def contar_referencias(nombres):
+    """
+    Devuelve {nombre: número de filas que lo usan} para los nombres dados.
+    """
+    nombres = {n for n in nombres if n}
+    conteo = dict.fromkeys(nombres, 0)
+    for nombre in Producto.objects.filter(imagen_principal__in=nombres).values_list('imagen_principal', flat=True):
+        conteo[nombre] += 1
+    for nombre in ColorVariante.objects.filter(imagen__in=nombres).values_list('imagen', flat=True):
+        conteo[nombre] += 1
+    return conteo
+
+
+def borrar_derivados(nombre, storage=None):
+    """
+    Borra los derivados de un original y su tarea de procesamiento.
+    """
+    storage = storage or almacenamiento()
+    for ancho in ANCHOS_DERIVADOS:
+        for formato in FORMATOS_DERIVADOS:
+            storage.delete(nombre_derivado(nombre, ancho, formato))
+    TareaImagen.objects.filter(archivo=nombre).delete()
+
+
+def borrar_archivo(nombre, storage=None):
+    """
+    Borra un original, sus derivados y su tarea de procesamiento.
+    """
+    storage = storage or almacenamiento()
+    borrar_derivados(nombre, storage)
+    storage.delete(nombre)
+
+
+def retirar(nombre, storage, gracia):
+    """
+    Aparta el original de `nombre` si no se usó en los últimos `gracia`
+    segundos. Devuelve False si sigue en uso (o ya no existe).
+    """
+    ruta = storage.path(nombre)
+    temporal = f"{ruta}.recolectando"
+    try:
+        os.rename(ruta, temporal)
+    except FileNotFoundError:
+        return False
+    if time.time() - os.stat(temporal).st_mtime < gracia:
+        # Una subida lo reutilizó hace poco: puede que su fila aún no esté guardada.
+        os.replace(temporal, ruta)
+        return False
+    os.remove(temporal)
+    return True
+
+
+def recolectar_huerfanos(nombres, gracia=None):
+    """
+    Borra los archivos de `nombres` que ya no tienen referencias ni se usaron
+    en los últimos `gracia` segundos (por defecto `RECOLECCION_GRACIA`).
+    Devuelve la lista de nombres eliminados.
+    """
+    gracia = settings.RECOLECCION_GRACIA if gracia is None else gracia
+    storage = almacenamiento()
+    eliminados = []
+    for nombre, referencias in contar_referencias(nombres).items():
+        if referencias == 0 and retirar(nombre, storage, gracia):
+            # El original ya no está en su nombre (puede haber uno nuevo subido
+            # después): solo quedan los derivados.
+            borrar_derivados(nombre, storage)
+            eliminados.append(nombre)
+    return eliminados
@@ -0,0 +1,145 @@
+# mi_app/rendimiento.py
+
+"""
+Medición de tiempos por petición para `RendimientoMiddleware`.
+
+Cada petición muestreada lleva una `Medicion` en una variable de contexto; el
+código mide tramos con `medir('nombre')`. Los tramos anidados del mismo nombre
+(un `{% include %}` dentro de una plantilla, p. ej.) cuentan una sola vez.
+
+Las plantillas y la sesión son de Django, así que `instrumentar()` envuelve una
+única vez `Template.render` y `load`/`save` del motor de sesiones configurado, y
+añade `medir_sql` a cada conexión a la base de datos. Fuera de una petición
+muestreada los envoltorios no hacen nada.
+
+La variable de contexto pasa a los hilos de `sync_to_async`, así que bajo ASGI
+se miden también las consultas y plantillas de vistas síncronas y asíncronas.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+_medicion = ContextVar('medicion_rendimiento', default=None)
+
+
+class Medicion:
+    """
+    Tiempo acumulado (segundos) y número de llamadas por tramo.
+    """
+
+    def __init__(self):
+        self.tiempos = {}
+        self.llamadas = {}
+        self._abiertos = {}
+
+    def sumar(self, nombre, segundos, llamadas=1):
+        self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + segundos
+        self.llamadas[nombre] = self.llamadas.get(nombre, 0) + llamadas
+
+    def ms(self, nombre):
+        return round(self.tiempos.get(nombre, 0.0) * 1000, 2)
+
+
+def actual():
+    return _medicion.get()
+
+
+def iniciar():
+    """
+    Empieza a medir en el contexto actual. Devuelve la medición y el token
+    para `terminar`.
+    """
+    medicion = Medicion()
+    return medicion, _medicion.set(medicion)
+
+
+def terminar(token):
+    _medicion.reset(token)
+
+
+@contextmanager
+def medir(nombre):
+    medicion = _medicion.get()
+    if medicion is None or medicion._abiertos.get(nombre):
+        yield
+        return
+    medicion._abiertos[nombre] = True
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion._abiertos[nombre] = False
+        medicion.sumar(nombre, time.perf_counter() - inicio)
+
+
+def medir_sql(execute, sql, params, many, context):
+    """
+    Envoltorio para `connection.execute_wrapper`: tiempo y número de consultas.
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.sumar('db', time.perf_counter() - inicio)
+
+
+def _envolver_conexion(sender=None, connection=None, **kwargs):
+    # Al principio de la lista: `execute_wrapper()` retira siempre el último.
+    if medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, medir_sql)
+
+
+def _envolver(clase, metodo, nombre):
+    original = getattr(clase, metodo)
+
+    def envoltorio(self, *args, **kwargs):
+        with medir(nombre):
+            return original(self, *args, **kwargs)
+
+    envoltorio.__wrapped__ = original
+    setattr(clase, metodo, envoltorio)
+
+
+def _envolver_async(clase, metodo, nombre):
+    original = getattr(clase, metodo)
+
+    async def envoltorio(self, *args, **kwargs):
+        with medir(nombre):
+            return await original(self, *args, **kwargs)
+
+    envoltorio.__wrapped__ = original
+    setattr(clase, metodo, envoltorio)
+
+
+_instrumentado = False
+
+
+def instrumentar():
+    """
+    Envuelve el render de plantillas, la carga/guardado de la sesión (también
+    `aload`/`asave`) y las consultas SQL. Idempotente.
+    """
+    global _instrumentado
+    if _instrumentado:
+        return
+    _envolver(Template, 'render', 'plantilla')
+    sesiones = import_module(settings.SESSION_ENGINE).SessionStore
+    for metodo in ('load', 'save'):
+        _envolver(sesiones, metodo, 'sesion')
+    for metodo in ('aload', 'asave'):
+        _envolver_async(sesiones, metodo, 'sesion')
+    # Las conexiones son por hilo: las nuevas se envuelven al abrirse.
+    connection_created.connect(_envolver_conexion)
+    for conexion in connections.all(initialized_only=True):
+        _envolver_conexion(connection=conexion)
+    _instrumentado = True
@@ -0,0 +1,109 @@
+# mi_app/replicas.py
+
+"""
+Lecturas del catálogo desde una réplica de solo lectura.
+
+Con `REPLICA_DATABASE_URL` (ver settings) `RouterReplica` manda las lecturas de
+`Producto` y `ColorVariante` al alias `replica`; todo lo demás, y toda
+escritura, va a la primaria. La réplica puede ir unos segundos por detrás, así
+que se lee de la primaria:
+
+* dentro de un bloque `atomic` de la primaria (p. ej. el de `procesar_pago`):
+  lo leído ahí decide qué se escribe;
+* en peticiones POST y en las que ya escribieron algo;
+* durante `REPLICA_FIJAR_SEGUNDOS` después de una petición que escribió, con la
+  cookie `COOKIE_PRIMARIA` que pone `ReplicaMiddleware` (quien acaba de agregar
+  al carrito o subir un producto lo ve en la página siguiente);
+* al renderizar una página en caché cuya versión cambió hace menos de ese
+  tiempo (`fijar_si_reciente`), para no guardar en caché datos de la réplica
+  anteriores al cambio.
+
+Fuera de una petición (comandos, tareas) solo aplica la regla de `atomic`.
+"""
+
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARIA = 'default'
+REPLICA = 'replica'
+ROUTER = 'mi_app.replicas.RouterReplica'
+COOKIE_PRIMARIA = 'primaria'
+
+MODELOS_CATALOGO = {('mi_app', 'producto'), ('mi_app', 'colorvariante')}
+
+
+class EstadoPeticion:
+    """
+    Si la petición en curso lee de la primaria y si escribió algo.
+    """
+
+    def __init__(self, fijada=False):
+        self.fijada = fijada
+        self.escribio = False
+
+
+_estado = ContextVar('replicas_estado', default=None)
+
+
+def activa():
+    return ROUTER in settings.DATABASE_ROUTERS
+
+
+def iniciar(fijada=False):
+    return _estado.set(EstadoPeticion(fijada))
+
+
+def terminar(token):
+    estado = _estado.get()
+    _estado.reset(token)
+    return estado
+
+
+def fijar():
+    """
+    El resto de la petición lee de la primaria.
+    """
+    estado = _estado.get()
+    if estado is not None:
+        estado.fijada = True
+
+
+def fijar_si_reciente(version):
+    """
+    `version` es una de `mi_app.versiones` (marca de tiempo en nanosegundos). Si
+    cambió hace menos de `REPLICA_FIJAR_SEGUNDOS`, la réplica puede no tener
+    aún el cambio y se lee de la primaria.
+    """
+    if time.time_ns() - version < settings.REPLICA_FIJAR_SEGUNDOS * 1_000_000_000:
+        fijar()
+
+
+class RouterReplica:
+
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label, model._meta.model_name) not in MODELOS_CATALOGO:
+            return None
+        estado = _estado.get()
+        if estado is not None and estado.fijada:
+            return PRIMARIA
+        if connections[PRIMARIA].in_atomic_block:
+            return PRIMARIA
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.fijada = estado.escribio = True
+        return PRIMARIA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {PRIMARIA, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica copia el esquema de la primaria.
+        return db == PRIMARIA
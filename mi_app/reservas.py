@@ -0,0 +1,98 @@
+# mi_app/reservas.py
+
+"""
+Reservas de stock durante el checkout.
+
+Al entrar al checkout se apartan las unidades del carrito durante
+`RESERVA_STOCK_TTL` segundos; así, en una promoción, quien llega tarde se
+entera al abrir el checkout y no al pagar. Las reservas vencidas dejan de
+contar en cuanto pasa `expira` (todas las consultas filtran por fecha); el
+comando `expirar_reservas` solo borra las filas viejas.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ColorVariante, ReservaStock
+from .stock import StockInsuficiente, reservas_vigentes
+
+
+def clave_reserva(request):
+    """
+    Clave del comprador: la de su sesión, que se crea aquí si aún no existe.
+    """
+    if not request.session.session_key:
+        request.session.save()
+    return request.session.session_key
+
+
+def reservadas(variante_ids, excluir_clave=None):
+    """
+    {variante_id: unidades reservadas vigentes}, con una sola consulta.
+    """
+    return dict(
+        reservas_vigentes(excluir_clave=excluir_clave)
+        .filter(variante_id__in=list(variante_ids))
+        .values_list('variante_id').annotate(total=Sum('cantidad'))
+    )
+
+
+def disponibles(variante_ids, excluir_clave=None):
+    """
+    {variante_id: stock - reservas vigentes de otros compradores}.
+    """
+    stock = dict(ColorVariante.objects.filter(pk__in=list(variante_ids)).values_list('pk', 'stock'))
+    apartadas = reservadas(stock, excluir_clave)
+    return {pk: unidades - apartadas.get(pk, 0) for pk, unidades in stock.items()}
+
+
+def reservar(clave, cantidades):
+    """
+    Aparta `cantidades` ({variante_id: n}) para `clave`, sustituyendo sus
+    reservas anteriores. Todo o nada: lanza `StockInsuficiente` sin reservar.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Un UPDATE que no cambia nada bloquea las filas de las variantes en
+        # orden de pk (también en SQLite, que no tiene SELECT FOR UPDATE), de modo
+        # que dos reservas sobre la misma variante se ejecutan una tras otra.
+        for variante_id in sorted(cantidades):
+            if not ColorVariante.objects.filter(pk=variante_id).update(stock=F('stock')):
+                raise StockInsuficiente(variante_id)
+
+        libres = disponibles(cantidades, excluir_clave=clave)
+        for variante_id, cantidad in cantidades.items():
+            if cantidad <= 0 or libres[variante_id] < cantidad:
+                raise StockInsuficiente(variante_id)
+
+        ReservaStock.objects.filter(clave=clave).delete()
+        expira = ahora + timedelta(seconds=settings.RESERVA_STOCK_TTL)
+        ReservaStock.objects.bulk_create([
+            ReservaStock(clave=clave, variante_id=variante_id, cantidad=cantidad, expira=expira)
+            for variante_id, cantidad in cantidades.items()
+        ])
+    return expira
+
+
+def liberar(clave):
+    """
+    Devuelve las unidades apartadas por `clave`.
+    """
+    return ReservaStock.objects.filter(clave=clave).delete()[0]
+
+
+def expirar(lote=1000):
+    """
+    Borra por lotes las reservas vencidas. Devuelve cuántas se borraron.
+    """
+    ahora = timezone.now()
+    total = 0
+    while True:
+        ids = list(ReservaStock.objects.filter(expira__lte=ahora).values_list('pk', flat=True)[:lote])
+        if not ids:
+            return total
+        total += ReservaStock.objects.filter(pk__in=ids).delete()[0]
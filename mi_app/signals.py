@@ -0,0 +1,146 @@
+# mi_app/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import busqueda
+from .models import Producto, ColorVariante
+from .recoleccion import recolectar_huerfanos
+from .stock import recalcular_stock_productos
+from .tareas import encolar_imagen
+from .versiones import invalidar_productos
+
+
+@receiver(post_save, sender=Producto)
+def derivados_producto(sender, instance, raw=False, **kwargs):
+    """
+    Encola el procesamiento de la imagen principal al guardar un producto
+    (formulario de `subir_producto` o admin).
+    """
+    if not raw:
+        encolar_imagen(instance.imagen_principal)
+
+
+@receiver(post_save, sender=ColorVariante)
+def derivados_variante(sender, instance, raw=False, **kwargs):
+    """
+    Encola el procesamiento de la imagen de una variante de color.
+    """
+    if not raw:
+        encolar_imagen(instance.imagen)
+
+
+def _recolectar(nombre):
+    # Tras el commit, para no borrar archivos si la eliminación se revierte.
+    if nombre:
+        transaction.on_commit(lambda: recolectar_huerfanos([nombre]))
+
+
+def _imagen_anterior(instance, campo):
+    # Nombre guardado en la base antes de este save ('' si la fila es nueva).
+    if instance.pk is None:
+        return ''
+    anterior = type(instance).objects.filter(pk=instance.pk).values_list(campo, flat=True).first()
+    return anterior or ''
+
+
+@receiver(pre_save, sender=Producto)
+def recordar_imagen_producto(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._imagen_reemplazada = _imagen_anterior(instance, 'imagen_principal')
+
+
+@receiver(pre_save, sender=ColorVariante)
+def recordar_imagen_variante(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._imagen_reemplazada = _imagen_anterior(instance, 'imagen')
+
+
+@receiver(post_save, sender=Producto)
+def recolectar_imagen_reemplazada_producto(sender, instance, raw=False, **kwargs):
+    """
+    Al cambiar la imagen principal, la anterior se recolecta si quedó huérfana.
+    """
+    anterior = getattr(instance, '_imagen_reemplazada', '')
+    if anterior != instance.imagen_principal.name:
+        _recolectar(anterior)
+
+
+@receiver(post_save, sender=ColorVariante)
+def recolectar_imagen_reemplazada_variante(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, '_imagen_reemplazada', '')
+    if anterior != instance.imagen.name:
+        _recolectar(anterior)
+
+
+@receiver(post_delete, sender=Producto)
+def recolectar_imagen_producto(sender, instance, **kwargs):
+    """
+    Borra la imagen principal si ningún otro producto o variante la usa
+    (por ejemplo, tras `eliminar_producto`).
+    """
+    _recolectar(instance.imagen_principal.name)
+
+
+@receiver(post_delete, sender=ColorVariante)
+def recolectar_imagen_variante(sender, instance, **kwargs):
+    """
+    Borra la imagen de la variante si quedó huérfana.
+    """
+    _recolectar(instance.imagen.name)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def cambio_producto(sender, instance, raw=False, **kwargs):
+    """
+    Invalida la página de detalle y la tarjeta del producto, la página del
+    catálogo, el digest y las respuestas del asistente.
+
+    Tras el commit: si la versión cambiara antes, una petición concurrente
+    podría renderizar aún los datos viejos y guardarlos con la versión nueva.
+    """
+    if not raw:
+        pks = [instance.pk]
+        transaction.on_commit(lambda: invalidar_productos(pks))
+
+
+@receiver(post_save, sender=ColorVariante)
+@receiver(post_delete, sender=ColorVariante)
+def cambio_variante(sender, instance, raw=False, **kwargs):
+    """
+    Las variantes se muestran dentro del producto: se recalcula su stock total
+    (formset del panel, admin) y se invalida el producto.
+    """
+    if not raw:
+        recalcular_stock_productos([instance.producto_id])
+        pks = [instance.producto_id]
+        transaction.on_commit(lambda: invalidar_productos(pks))
+
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, raw=False, **kwargs):
+    """
+    Actualiza el índice de búsqueda con el nombre y la descripción del producto.
+    """
+    if not raw:
+        busqueda.indexar(instance)
+
+
+@receiver(post_delete, sender=Producto)
+def desindexar_producto(sender, instance, **kwargs):
+    busqueda.desindexar(instance.pk)
+
+
+@receiver(post_save, sender=ColorVariante)
+@receiver(post_delete, sender=ColorVariante)
+def reindexar_colores(sender, instance, raw=False, **kwargs):
+    """
+    Los colores de las variantes también se indexan: se reindexa el producto.
+    """
+    if raw:
+        return
+    producto = Producto.objects.prefetch_related('variantes').filter(pk=instance.producto_id).first()
+    if producto is not None:
+        busqueda.indexar(producto)
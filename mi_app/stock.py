@@ -0,0 +1,287 @@
+# mi_app/stock.py
+
+"""
+Descuento de stock por lotes para el checkout.
+
+En lugar de leer cada variante, restar en Python y guardar (2N consultas y una
+carrera entre checkouts simultáneos), se hace una consulta para todas las
+variantes y un `UPDATE ... SET stock = stock - n WHERE stock >= n` por línea.
+Si alguna línea no se puede descontar se revierte todo.
+
+Las unidades apartadas por otros compradores (`ReservaStock` vigentes) no se
+pueden vender: la condición del UPDATE es `stock >= n + reservas ajenas`.
+
+`Producto.stock_total` y `Producto.en_stock` se mantienen en la misma
+transacción que cada cambio: por diferencia (`sumar_stock_productos`) donde se
+conoce, o recalculando desde las variantes (`recalcular_stock_productos`).
+"""
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AjusteStock, ColorVariante, Producto, ReservaStock
+from .versiones import invalidar_productos
+
+
+class StockInsuficiente(Exception):
+    """
+    Alguna variante no existe o no tiene unidades suficientes.
+    """
+
+    def __init__(self, variante_id):
+        super().__init__(f"Stock insuficiente para la variante {variante_id}")
+        self.variante_id = variante_id
+
+
+def cantidades_del_carrito(cart):
+    """
+    {variante_id: cantidad} a partir de los ítems del carrito.
+    """
+    cantidades = {}
+    for item_id, item_data in cart.items.items():
+        variante_id = int(item_id)
+        cantidades[variante_id] = cantidades.get(variante_id, 0) + int(item_data['quantity'])
+    return cantidades
+
+
+# Productos por UPDATE al sumar diferencias (cuatro parámetros por producto).
+TAMANO_PRODUCTOS = 250
+
+
+def sumar_stock_productos(diferencias):
+    """
+    Aplica {producto_id: diferencia} a `stock_total` con un solo UPDATE sobre
+    `F('stock_total')` y actualiza `en_stock` con el valor resultante.
+    """
+    pendientes = sorted((pk, diferencia) for pk, diferencia in diferencias.items() if diferencia)
+    for inicio in range(0, len(pendientes), TAMANO_PRODUCTOS):
+        lote = pendientes[inicio:inicio + TAMANO_PRODUCTOS]
+        Producto.objects.filter(pk__in=[pk for pk, _ in lote]).update(
+            stock_total=Case(
+                *[When(pk=pk, then=F('stock_total') + Value(diferencia)) for pk, diferencia in lote],
+                default=F('stock_total'),
+            ),
+            # La expresión ve los valores previos a la actualización: stock_total + d > 0.
+            en_stock=Case(
+                *[When(pk=pk, stock_total__gt=-diferencia, then=Value(True)) for pk, diferencia in lote],
+                default=Value(False), output_field=BooleanField(),
+            ),
+        )
+
+
+def stock_real():
+    """
+    Expresiones con el stock total y la disponibilidad calculados desde las
+    variantes del producto de la fila exterior.
+    """
+    variantes = ColorVariante.objects.filter(producto=OuterRef('pk'))
+    total = Coalesce(Subquery(
+        variantes.order_by().values('producto').annotate(total=Sum('stock')).values('total')
+    ), Value(0))
+    return total, Exists(variantes.filter(stock__gt=0))
+
+
+def recalcular_stock_productos(producto_ids):
+    """
+    Recalcula `stock_total` y `en_stock` de estos productos desde sus variantes.
+    Para cambios sin diferencia conocida (formset del panel, admin).
+    """
+    total, disponible = stock_real()
+    return Producto.objects.filter(pk__in=list(producto_ids)).update(stock_total=total, en_stock=disponible)
+
+
+def reservas_vigentes(ahora=None, excluir_clave=None):
+    """
+    Reservas sin vencer, opcionalmente sin las del comprador `excluir_clave`.
+    """
+    reservas = ReservaStock.objects.filter(expira__gt=ahora or timezone.now())
+    if excluir_clave:
+        reservas = reservas.exclude(clave=excluir_clave)
+    return reservas
+
+
+def reservado_por_variante(reservas):
+    """
+    Subconsulta con la suma de `reservas` de la variante de la fila exterior.
+    """
+    return Coalesce(Subquery(
+        reservas.filter(variante=OuterRef('pk'))
+        .values('variante').annotate(total=Sum('cantidad')).values('total')
+    ), Value(0))
+
+
+def descontar_stock(cantidades, clave=None):
+    """
+    Descuenta todas las cantidades o ninguna.
+    `clave` es la del comprador: sus propias reservas no le restan disponibilidad
+    y se liberan al descontar. Lanza `StockInsuficiente` si alguna variante no alcanza.
+    """
+    with transaction.atomic():
+        variantes = ColorVariante.objects.only('pk', 'stock', 'producto_id').in_bulk(list(cantidades))
+
+        # Comprobación previa con los datos leídos, para fallar sin escribir.
+        for variante_id, cantidad in cantidades.items():
+            variante = variantes.get(variante_id)
+            if variante is None or cantidad <= 0 or variante.stock < cantidad:
+                raise StockInsuficiente(variante_id)
+
+        # Orden fijo de pk para que checkouts concurrentes bloqueen en el mismo orden.
+        ajenas = reservado_por_variante(reservas_vigentes(excluir_clave=clave))
+        for variante_id in sorted(cantidades):
+            cantidad = cantidades[variante_id]
+            actualizadas = ColorVariante.objects.filter(
+                pk=variante_id, stock__gte=Value(cantidad) + ajenas,
+            ).update(stock=F('stock') - cantidad)
+            if not actualizadas:
+                # Otro checkout se adelantó o el resto está reservado.
+                raise StockInsuficiente(variante_id)
+
+        if clave:
+            ReservaStock.objects.filter(clave=clave, variante_id__in=list(cantidades)).delete()
+
+        diferencias = {}
+        for variante_id, cantidad in cantidades.items():
+            producto_id = variantes[variante_id].producto_id
+            diferencias[producto_id] = diferencias.get(producto_id, 0) - cantidad
+        sumar_stock_productos(diferencias)
+
+        # `update()` no emite señales: se invalidan a mano las páginas en caché.
+        producto_ids = set(diferencias)
+        transaction.on_commit(lambda: invalidar_productos(producto_ids))
+
+
+# --- Ajustes manuales (reposición, inventario) ---
+
+DELTA = 'delta'
+ABSOLUTO = 'absoluto'
+
+# Variantes por UPDATE en los ajustes masivos.
+TAMANO_AJUSTE = 500
+
+
+class AjusteInvalido(ValueError):
+    """
+    Un ajuste de stock no se puede aplicar (variante inexistente, stock negativo...).
+    """
+
+
+def combinar_ajustes(ajustes):
+    """
+    Reduce [(variante_id, modo, valor)] a una operación por variante, en orden:
+    dos deltas se suman, un absoluto reemplaza lo anterior y un delta posterior
+    a un absoluto se le suma.
+    """
+    combinados = {}
+    for variante_id, modo, valor in ajustes:
+        if modo not in (DELTA, ABSOLUTO):
+            raise AjusteInvalido(f"Modo desconocido: {modo}")
+        previo = combinados.get(variante_id)
+        if previo is None or modo == ABSOLUTO:
+            combinados[variante_id] = (modo, valor)
+        else:
+            combinados[variante_id] = (previo[0], previo[1] + valor)
+    return combinados
+
+
+def ajustar_stock(ajustes, usuario=None, motivo=''):
+    """
+    Aplica muchos ajustes [(variante_id, modo, valor)] en una transacción con un
+    número fijo de consultas por cada `TAMANO_AJUSTE` variantes: lectura
+    bloqueante, un UPDATE con CASE sobre `F('stock')`, relectura y un
+    `bulk_create` de la auditoría. Todo o nada; devuelve los `AjusteStock`.
+    """
+    combinados = combinar_ajustes(ajustes)
+    registros = []
+    with transaction.atomic():
+        ids = sorted(combinados)
+        for inicio in range(0, len(ids), TAMANO_AJUSTE):
+            registros.extend(_ajustar_lote(ids[inicio:inicio + TAMANO_AJUSTE], combinados, usuario, motivo))
+        AjusteStock.objects.bulk_create(registros)
+
+        diferencias = {}
+        for registro in registros:
+            producto_id = registro.variante.producto_id
+            diferencias[producto_id] = diferencias.get(producto_id, 0) + registro.diferencia
+        sumar_stock_productos(diferencias)
+
+        producto_ids = set(diferencias)
+        transaction.on_commit(lambda: invalidar_productos(producto_ids))
+    return registros
+
+
+def _ajustar_lote(ids, combinados, usuario, motivo):
+    # FOR UPDATE en orden de pk: en PostgreSQL bloquea las filas frente a checkouts simultáneos.
+    anteriores = {
+        variante.pk: variante
+        for variante in ColorVariante.objects.select_for_update().filter(pk__in=ids)
+        .order_by('pk').only('pk', 'stock', 'producto_id')
+    }
+    faltantes = set(ids) - set(anteriores)
+    if faltantes:
+        raise AjusteInvalido(f"Variantes inexistentes: {sorted(faltantes)}")
+
+    # El delta se aplica sobre `F('stock')`, así no pisa un descuento concurrente.
+    ColorVariante.objects.filter(pk__in=ids).update(stock=Case(
+        *[
+            When(pk=pk, then=F('stock') + Value(valor) if modo == DELTA else Value(valor))
+            for pk, (modo, valor) in ((pk, combinados[pk]) for pk in ids)
+        ],
+        default=F('stock'),
+    ))
+
+    nuevos = dict(ColorVariante.objects.filter(pk__in=ids).values_list('pk', 'stock'))
+    negativos = sorted(pk for pk, stock in nuevos.items() if stock < 0)
+    if negativos:
+        raise AjusteInvalido(f"El stock quedaría negativo en las variantes {negativos}")
+
+    registros = []
+    for pk in ids:
+        modo, valor = combinados[pk]
+        # Con un delta el valor anterior exacto es el nuevo menos el delta.
+        anterior = nuevos[pk] - valor if modo == DELTA else anteriores[pk].stock
+        if nuevos[pk] != anterior:
+            registros.append(AjusteStock(
+                variante=anteriores[pk], stock_anterior=anterior, stock_nuevo=nuevos[pk],
+                usuario=usuario, motivo=motivo[:200],
+            ))
+    return registros
+
+
+# --- Conciliación de Producto.stock_total ---
+
+def desvios_stock(lote=1000):
+    """
+    Recorre los productos por lotes de pk y devuelve
+    [(producto_id, stock_total guardado, stock real)] de los que no cuadran.
+    """
+    total, disponible = stock_real()
+    desvios, ultimo = [], 0
+    while True:
+        filas = list(
+            Producto.objects.filter(pk__gt=ultimo).order_by('pk')
+            .annotate(real=total, real_en_stock=disponible)
+            .values_list('pk', 'stock_total', 'en_stock', 'real', 'real_en_stock')[:lote]
+        )
+        if not filas:
+            return desvios
+        for pk, guardado, en_stock, real, real_en_stock in filas:
+            if guardado != real or en_stock != real_en_stock:
+                desvios.append((pk, guardado, real))
+        ultimo = filas[-1][0]
+
+
+def conciliar_stock(lote=1000, corregir=True):
+    """
+    Detecta (y si `corregir`, arregla) los productos cuyo stock guardado no
+    coincide con la suma de sus variantes. Devuelve la lista de `desvios_stock`.
+    """
+    desvios = desvios_stock(lote)
+    if corregir and desvios:
+        ids = [pk for pk, _, _ in desvios]
+        with transaction.atomic():
+            for inicio in range(0, len(ids), lote):
+                recalcular_stock_productos(ids[inicio:inicio + lote])
+            transaction.on_commit(lambda: invalidar_productos(ids))
+    return desvios
@@ -0,0 +1,76 @@
+# mi_app/storage.py
+
+"""
+Almacenamiento direccionado por contenido para las imágenes de productos.
+
+Cada archivo se guarda con el SHA-256 de su contenido como nombre, de modo que
+subir dos veces la misma imagen no crea copias (`Imagen56.png`,
+`Imagen56_8CnV3v4.png`, ...). Varias filas pueden apuntar al mismo archivo;
+`mi_app.recoleccion` se encarga de borrarlo cuando ya nadie lo referencia.
+"""
+
+import hashlib
+import os
+import posixpath
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .imagenes import CARPETA_DERIVADOS
+
+
+def hash_contenido(content):
+    """
+    SHA-256 hexadecimal de un archivo, leído por bloques.
+    """
+    sha = hashlib.sha256()
+    for bloque in content.chunks():
+        sha.update(bloque)
+    content.seek(0)
+    return sha.hexdigest()
+
+
+def nombre_por_contenido(name, digest):
+    """
+    `productos/Imagen56.png` + hash -> `productos/<hash>.png`.
+    """
+    carpeta = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(carpeta, f"{digest}{extension}")
+
+
+@deconstructible
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """
+    FileSystemStorage que nombra los archivos por su contenido.
+    Los derivados de imagen conservan sus nombres deterministas.
+    """
+
+    def es_derivado(self, name):
+        return name.startswith(CARPETA_DERIVADOS + '/')
+
+    def reutilizar(self, name):
+        """
+        Si ya existe un archivo idéntico, le actualiza la fecha de modificación
+        (la recolección no borra archivos usados hace poco, ver
+        `mi_app.recoleccion`) y devuelve True. False si no existe o se está
+        recolectando: entonces se escribe de nuevo.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        if not self.es_derivado(name):
+            name = nombre_por_contenido(name, hash_contenido(content))
+            if self.reutilizar(name):
+                return name
+        return super().save(name, content, max_length=max_length)
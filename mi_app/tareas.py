@@ -0,0 +1,131 @@
+# mi_app/tareas.py
+
+"""
+Cola local de tareas de imagen respaldada por la tabla `TareaImagen`.
+
+Las vistas y el admin solo encolan; el trabajo pesado (redimensionar, optimizar,
+calcular el hash y generar el placeholder) lo hace el worker
+`manage.py procesar_tareas`.
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+
+from .imagenes import derivar, generar_placeholder
+from .models import ColorVariante, Producto, TareaImagen
+from .versiones import invalidar_productos
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 3
+
+
+def encolar_imagen(field_file):
+    """
+    Registra una tarea pendiente para la imagen, si no existía ya.
+    Los nombres subidos son únicos, así que un archivo ya procesado no se repite.
+    """
+    if not field_file:
+        return None
+    tarea, creada = TareaImagen.objects.get_or_create(archivo=field_file.name)
+    if creada and getattr(settings, 'TAREAS_SINCRONAS', False):
+        # Modo de desarrollo sin worker: se procesa al confirmar la transacción.
+        transaction.on_commit(lambda: ejecutar_tarea(tarea))
+    return tarea
+
+
+def reclamar_siguiente():
+    """
+    Marca como `procesando` la tarea pendiente más antigua y la devuelve.
+    El UPDATE condicional evita que dos workers tomen la misma tarea.
+    """
+    while True:
+        tarea = (TareaImagen.objects
+                 .filter(estado=TareaImagen.PENDIENTE)
+                 .order_by('creada', 'pk')
+                 .first())
+        if tarea is None:
+            return None
+        reclamada = TareaImagen.objects.filter(
+            pk=tarea.pk, estado=TareaImagen.PENDIENTE,
+        ).update(estado=TareaImagen.PROCESANDO, intentos=F('intentos') + 1, actualizada=timezone.now())
+        if reclamada:
+            tarea.refresh_from_db()
+            return tarea
+
+
+def liberar_bloqueadas(minutos=15):
+    """
+    Devuelve a la cola las tareas que quedaron en `procesando` (worker caído).
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return TareaImagen.objects.filter(
+        estado=TareaImagen.PROCESANDO, actualizada__lt=limite,
+    ).update(estado=TareaImagen.PENDIENTE)
+
+
+def procesar(tarea, storage=None):
+    """
+    Ejecuta todos los pasos de una tarea y guarda sus resultados.
+    """
+    storage = storage or Producto._meta.get_field('imagen_principal').storage
+    with storage.open(tarea.archivo, 'rb') as original:
+        contenido = original.read()
+
+    imagen = Image.open(BytesIO(contenido))
+    imagen.load()
+
+    # Los derivados se guardan ya optimizados (WebP/JPEG progresivo).
+    derivar(imagen, storage, tarea.archivo)
+    tarea.sha256 = hashlib.sha256(contenido).hexdigest()
+    tarea.placeholder = generar_placeholder(imagen)
+    tarea.estado = TareaImagen.COMPLETADA
+    tarea.error = ''
+    tarea.save(update_fields=['sha256', 'placeholder', 'estado', 'error', 'actualizada'])
+
+    # Las tarjetas y páginas en caché se renderizaron sin `srcset`: se invalidan
+    # los productos que usan esta imagen para que tomen los derivados.
+    pks = productos_con_imagen(tarea.archivo)
+    if pks:
+        transaction.on_commit(lambda: invalidar_productos(pks))
+
+
+def productos_con_imagen(nombre):
+    """
+    pks de los productos cuya imagen principal o alguna variante es `nombre`.
+    """
+    principales = Producto.objects.filter(imagen_principal=nombre).values_list('pk', flat=True)
+    variantes = ColorVariante.objects.filter(imagen=nombre).values_list('producto_id', flat=True)
+    return set(principales) | set(variantes)
+
+
+def ejecutar_tarea(tarea):
+    """
+    Procesa una tarea registrando el error si falla.
+    Se reintenta hasta `MAX_INTENTOS` veces antes de marcarla como fallida.
+    """
+    try:
+        procesar(tarea)
+    except Exception as e:
+        logger.exception("Error procesando %s", tarea.archivo)
+        tarea.error = str(e)
+        tarea.estado = TareaImagen.PENDIENTE if tarea.intentos < MAX_INTENTOS else TareaImagen.ERROR
+        tarea.save(update_fields=['error', 'estado', 'actualizada'])
+        return False
+    return True
+
+
+def estados_por_archivo(nombres):
+    """
+    Diccionario {archivo: TareaImagen} para un conjunto de nombres, en una consulta.
+    """
+    nombres = [n for n in nombres if n]
+    return {t.archivo: t for t in TareaImagen.objects.filter(archivo__in=nombres)}
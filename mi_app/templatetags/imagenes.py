@@ -0,0 +1,31 @@
+# mi_app/templatetags/imagenes.py
+
+from django import template
+
+from .. import imagenes
+
+register = template.Library()
+
+
+@register.inclusion_tag('mi_app/includes/imagen_responsive.html')
+def imagen_responsive(field_file, alt='', clase='', sizes='100vw'):
+    """
+    Renderiza un <picture> con `srcset` WebP y JPEG.
+    Si los derivados aún no existen se usa la imagen original.
+    """
+    return {
+        'url': field_file.url if field_file else '',
+        'srcset_webp': imagenes.srcset(field_file, 'webp'),
+        'srcset_jpeg': imagenes.srcset(field_file, 'jpeg'),
+        'alt': alt,
+        'clase': clase,
+        'sizes': sizes,
+    }
+
+
+@register.filter
+def derivado(field_file, ancho):
+    """
+    Uso: {{ producto.imagen_principal|derivado:1024 }}
+    """
+    return imagenes.url_derivado(field_file, int(ancho))
@@ -0,0 +1,15 @@
+# mi_app/texto.py
+
+import re
+import unicodedata
+
+
+def normalizar(texto):
+    """
+    Minúsculas, sin tildes, sin signos de puntuación y con espacios simples,
+    para que "¿Cuánto demora el envío?" y "cuanto demora el envio" coincidan.
+    """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    return ' '.join(texto.split())
@@ -11,6 +11,7 @@ urlpatterns = [
     path('ver-carrito/', views.ver_carrito, name='ver_carrito'),
     path('eliminar-del-carrito/<str:item_id>/', views.eliminar_del_carrito, name='eliminar_del_carrito'),
     path('api/cart-count/', views.cart_count_view, name='cart_count'),
+    path('api/catalogo/', views.catalogo_api, name='catalogo_api'),
 
     # Rutas para el proceso de pago
     path('checkout/<int:pk>/<int:variante_pk>/', views.checkout_view, name='checkout_view'),
@@ -21,6 +22,7 @@ urlpatterns = [
 
     # Ruta para el asistente de IA
     path('get-ai-response/', views.get_ai_response, name='get_ai_response'),
+    path('get-ai-response/stream/', views.get_ai_response_stream, name='get_ai_response_stream'),
 
     # Rutas de autenticación y registro
     path('login/', views.login_view, name='login'),
@@ -32,4 +34,6 @@ urlpatterns = [
     path('subir-producto/', views.subir_producto, name='subir_producto'),
     path('modificar-producto/<int:pk>/', views.subir_producto, name='modificar_producto'),
     path('eliminar-producto/<int:pk>/', views.eliminar_producto, name='eliminar_producto'),
+    path('dashboard/stock/', views.ajustar_stock_view, name='ajustar_stock'),
+    path('dashboard/stock/api/', views.ajustar_stock_api, name='ajustar_stock_api'),
 ]
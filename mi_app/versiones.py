@@ -0,0 +1,63 @@
+# mi_app/versiones.py
+
+"""
+Versiones en caché del catálogo y de cada producto.
+
+Las claves de caché de páginas, fragmentos, el digest y las respuestas del
+asistente incluyen una de estas versiones; para invalidarlas basta con cambiar
+la versión. Se usa una marca de tiempo en nanosegundos (y no un contador) para
+que una versión expulsada de la caché nunca vuelva a coincidir con una anterior.
+"""
+
+import time
+
+from django.core.cache import cache
+
+CLAVE_VERSION_CATALOGO = 'catalogo:version'
+
+
+def _nueva_version():
+    return time.time_ns()
+
+
+def _clave_producto(pk):
+    return f"producto:version:{pk}"
+
+
+def version_catalogo():
+    """
+    Cambia cada vez que se modifica cualquier producto o variante.
+    """
+    return cache.get_or_set(CLAVE_VERSION_CATALOGO, _nueva_version, timeout=None)
+
+
+def versiones_productos(pks):
+    """
+    {pk: versión} en una sola lectura de la caché.
+    """
+    claves = {_clave_producto(pk): pk for pk in pks}
+    encontradas = cache.get_many(list(claves))
+    faltantes = {clave: _nueva_version() for clave in claves if clave not in encontradas}
+    if faltantes:
+        cache.set_many(faltantes, timeout=None)
+        encontradas.update(faltantes)
+    return {pk: encontradas[clave] for clave, pk in claves.items()}
+
+
+def anotar_versiones(productos):
+    """
+    Asigna `version_cache` a cada producto, usado en la clave de su fragmento.
+    """
+    versiones = versiones_productos([producto.pk for producto in productos])
+    for producto in productos:
+        producto.version_cache = versiones[producto.pk]
+    return productos
+
+
+def invalidar_productos(pks):
+    """
+    Invalida las páginas y fragmentos de estos productos y del catálogo completo.
+    """
+    version = _nueva_version()
+    cache.set_many({_clave_producto(pk): version for pk in pks}, timeout=None)
+    cache.set(CLAVE_VERSION_CATALOGO, version, timeout=None)
@@ -4,93 +4,146 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Producto, ColorVariante
-from .forms import ProductoForm, LoginForm, ColorVarianteFormSet, CustomUserCreationForm
+from . import asistente, catalogo, imagenes, replicas, reservas
+from .cart import Cart
+from .models import Producto, ColorVariante, AjusteStock, LineaPedido, Pedido
+from .pedidos import registrar_pedido
+from .stock import ABSOLUTO, DELTA, AjusteInvalido, StockInsuficiente, ajustar_stock, cantidades_del_carrito
+from .tareas import estados_por_archivo
+from .versiones import version_catalogo, versiones_productos
+from .forms import ProductoForm, LoginForm, ColorVarianteFormSet, CustomUserCreationForm, AjusteStockForm
 from django.db import transaction
+from django.db.models import Sum
 import os
 import json
-import requests
-from django.http import JsonResponse
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 
 # --- Vistas del catálogo público ---
 def catalogo_publico(request):
     """
     Muestra la página principal del catálogo de productos.
-    Recupera todos los productos y el conteo del carrito desde la sesión.
-    """
-    productos = Producto.objects.all()
-    if 'cart' not in request.session:
-        request.session['cart'] = {}
-    cart_count = sum(item['quantity'] for item in request.session['cart'].values())
-    return render(request, 'mi_app/catalogo_publico.html', {'productos': productos, 'cart_count': cart_count})
+    Solo se renderiza la primera página; el resto se carga con `catalogo_api`.
+    La página es igual para todos los visitantes y se guarda en caché por versión
+    del catálogo; el contador del carrito se pide aparte a `cart_count_view`.
+    No toca la sesión: los visitantes anónimos no generan filas en `django_session`.
+    """
+    version = version_catalogo()
+    clave = f"pagina:catalogo_publico:{version}"
+    html = cache.get(clave)
+    if html is None:
+        # Con réplica: si el catálogo acaba de cambiar, se lee de la primaria
+        # para no guardar en caché una copia anterior al cambio.
+        replicas.fijar_si_reciente(version)
+        productos, siguiente = catalogo.pagina(Producto.objects.catalogo())
+        html = render_to_string('mi_app/catalogo_publico.html', {'productos': productos, 'siguiente': siguiente}, request)
+        cache.set(clave, html, settings.CACHE_PAGINAS_TIMEOUT)
+    return HttpResponse(html)
 
 def producto_detalle(request, pk):
     """
     Muestra los detalles de un producto específico.
+    Se guarda en caché por versión del producto, que cambia al modificar el
+    producto o sus variantes.
+    """
+    # El formulario envía el token CSRF desde la cookie; nos aseguramos de que exista.
+    get_token(request)
+    version = versiones_productos([pk])[pk]
+    clave = f"pagina:producto_detalle:{pk}:{version}"
+    html = cache.get(clave)
+    if html is None:
+        replicas.fijar_si_reciente(version)
+        producto = get_object_or_404(Producto.objects.catalogo(), pk=pk)
+        html = render_to_string('mi_app/producto_detalle.html', {'producto': producto}, request)
+        cache.set(clave, html, settings.CACHE_PAGINAS_TIMEOUT)
+    return HttpResponse(html)
+
+def catalogo_api(request):
+    """
+    API JSON del catálogo con filtros (`categoria`, `color`, `disponibles=1`),
+    búsqueda (`q`), orden (`orden=disponibilidad`) y paginación por cursor
+    (`cursor`, `limite`).
+    Con `html=1` devuelve las tarjetas ya renderizadas para el scroll infinito.
     """
-    producto = get_object_or_404(Producto, pk=pk)
-    if 'cart' not in request.session:
-        request.session['cart'] = {}
-    cart_count = sum(item['quantity'] for item in request.session['cart'].values())
-    return render(request, 'mi_app/producto_detalle.html', {'producto': producto, 'cart_count': cart_count})
+    try:
+        productos, siguiente = catalogo.desde_request(request)
+    except (catalogo.CursorInvalido, ValueError):
+        return JsonResponse({"error": "Parámetros de paginación inválidos."}, status=400)
+
+    if request.GET.get('html'):
+        html = ''.join(
+            render_to_string('mi_app/includes/producto_card.html', {'producto': producto}, request)
+            for producto in productos
+        )
+        return JsonResponse({'html': html, 'siguiente': siguiente})
+
+    data = [{
+        'id': producto.pk,
+        'nombre': producto.nombre,
+        'descripcion': producto.descripcion,
+        'precio': str(producto.precio),
+        'categoria': producto.categoria,
+        'color_principal': producto.color_principal,
+        'total_stock': producto.stock_total,
+        'en_stock': producto.en_stock,
+        'url': reverse('producto_detalle', args=[producto.pk]),
+        'imagen': producto.imagen_principal.url if producto.imagen_principal else None,
+        'srcset': imagenes.srcset(producto.imagen_principal),
+    } for producto in productos]
+    return JsonResponse({'productos': data, 'siguiente': siguiente})
 
 def add_to_cart(request):
     """
     Agrega un producto con una variante y cantidad al carrito de la sesión.
     Devuelve una respuesta JSON para ser utilizada en llamadas AJAX.
+    La variante y su producto se leen en una sola consulta, que además
+    comprueba que la variante sea de ese producto.
     """
     if request.method == 'POST':
-        product_id = request.POST.get('product_id')
-        variant_id = request.POST.get('variant_id')
-        quantity = int(request.POST.get('quantity', 1))
-
-        product = get_object_or_404(Producto, pk=product_id)
-        variant = get_object_or_404(ColorVariante, pk=variant_id)
-        
-        cart = request.session.get('cart', {})
-        if str(variant_id) in cart:
-            cart[str(variant_id)]['quantity'] += quantity
-        else:
-            cart[str(variant_id)] = {
-                'id': str(variant_id),
-                'product_id': product.pk,
-                'name': product.nombre,
-                'price': str(product.precio),
-                'color': variant.color,
-                'image_url': variant.imagen.url,
-                'quantity': quantity,
-            }
-        request.session['cart'] = cart
-        cart_count = sum(item['quantity'] for item in request.session['cart'].values())
-        return JsonResponse({'success': True, 'cart_count': cart_count})
+        try:
+            quantity = int(request.POST.get('quantity', 1))
+        except ValueError:
+            quantity = 0
+        if quantity < 1:
+            return JsonResponse({'success': False}, status=400)
+
+        variant = get_object_or_404(
+            ColorVariante.objects.select_related('producto'),
+            pk=request.POST.get('variant_id'), producto_id=request.POST.get('product_id'),
+        )
+
+        cart = Cart(request)
+        cart.add(variant.producto, variant, quantity)
+        return JsonResponse({'success': True, 'cart_count': cart.count})
     return JsonResponse({'success': False}, status=400)
 
-def cart_count_view(request):
+async def cart_count_view(request):
     """
     Devuelve la cantidad de productos en el carrito de la sesión en formato JSON.
     Esta vista es utilizada por la llamada AJAX en la plantilla.
+    Lee solo el contador guardado, sin recorrer los ítems del carrito, y carga
+    la sesión con la API asíncrona para no ocupar un hilo bajo ASGI.
     """
-    cart = request.session.get('cart', {})
-    cart_count = sum(item['quantity'] for item in cart.values())
-    return JsonResponse({"cart_count": cart_count})
+    return JsonResponse({"cart_count": await Cart.acount_for(request)})
 
 def ver_carrito(request):
     """
     Muestra la página del carrito, con los productos y el precio total.
+    Precios y stock se revalidan contra la base; se avisa de lo que cambió.
     """
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total_price = 0
-    for item_id, item_data in cart.items():
-        item_data['id'] = item_id
-        total_price += float(item_data['price']) * item_data['quantity']
-        cart_items.append(item_data)
-    
+    revision = Cart(request).revisar()
     context = {
-        'cart_items': cart_items,
-        'total_price': total_price,
-        'cart_count': sum(item['quantity'] for item in request.session['cart'].values())
+        'cart_items': revision.disponibles,
+        'total_price': revision.total,
+        'revision': revision,
     }
     return render(request, 'mi_app/ver_carrito.html', context)
 
@@ -99,10 +152,7 @@ def eliminar_del_carrito(request, item_id):
     Elimina un ítem específico del carrito de la sesión.
     """
     if request.method == 'POST':
-        cart = request.session.get('cart', {})
-        if str(item_id) in cart:
-            del cart[str(item_id)]
-            request.session['cart'] = cart
+        Cart(request).remove(item_id)
     return redirect('ver_carrito')
 
 
@@ -110,14 +160,17 @@ def eliminar_del_carrito(request, item_id):
 def checkout_view(request, pk, variante_pk):
     """
     Inicia el proceso de pago para un solo producto.
+    No aparta stock: el formulario paga el carrito (`procesar_pago`) y una
+    reserva aquí sustituiría las del carrito sin consumirse nunca. Solo se
+    comprueba que quede alguna unidad sin reservar por otros compradores.
     """
     producto = get_object_or_404(Producto, pk=pk)
     try:
         variante = ColorVariante.objects.get(pk=variante_pk, producto=producto)
-        if variante.stock <= 0:
-            return redirect('error_stock')
     except ColorVariante.DoesNotExist:
         return redirect('error_stock')
+    if reservas.disponibles([variante.pk], excluir_clave=request.session.session_key)[variante.pk] < 1:
+        return redirect('error_stock')
 
     contexto = {
         'producto': producto,
@@ -129,43 +182,43 @@ def checkout_view(request, pk, variante_pk):
 def checkout_carrito(request):
     """
     Inicia el proceso de pago para todos los productos en el carrito.
+    Aparta el stock del carrito: si algo ya no alcanza se avisa aquí y no al pagar.
     """
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total_price = 0
-    
-    for item_id, item_data in cart.items():
-        total_price += float(item_data['price']) * item_data['quantity']
-        cart_items.append(item_data)
-
-    if not cart_items:
+    cart = Cart(request)
+    if not len(cart):
         return redirect('catalogo_publico')
+    revision = cart.revisar()
+    if not revision.disponibles:
+        return redirect('ver_carrito')
+    try:
+        reservas.reservar(reservas.clave_reserva(request), cantidades_del_carrito(cart))
+    except StockInsuficiente:
+        return redirect('error_stock')
 
     context = {
-        'cart_items': cart_items,
-        'total_price': total_price,
+        'cart_items': revision.disponibles,
+        'total_price': revision.total,
+        'revision': revision,
         'ciudades': ['Lima', 'Provincia']
     }
     return render(request, 'mi_app/checkout_carrito.html', context)
 
-@transaction.atomic
 def procesar_pago(request):
     """
-    Procesa el pago, valida el stock y vacía el carrito.
-    Utiliza una transacción atómica para asegurar la integridad de los datos.
+    Procesa el pago, valida el stock, registra el pedido y vacía el carrito.
+    El stock se descuenta con UPDATE condicionales en la misma transacción que
+    guarda el pedido: o se registra todo o nada.
     """
     if request.method == 'POST':
-        cart = request.session.get('cart', {})
-        
-        for item_id, item_data in cart.items():
-            variante = get_object_or_404(ColorVariante, pk=item_id)
-            if variante.stock >= item_data['quantity']:
-                variante.stock -= item_data['quantity']
-                variante.save()
-            else:
+        cart = Cart(request)
+
+        if len(cart):
+            try:
+                registrar_pedido(cart, request.POST, request.session.session_key)
+            except StockInsuficiente:
                 return redirect('error_stock')
-        
-        request.session['cart'] = {}
+
+        cart.clear()
         return redirect('compra_exitosa')
     return redirect('catalogo_publico')
 
@@ -183,50 +236,56 @@ def error_stock_view(request):
 
 
 # --- Vista del asistente virtual con IA (Gemini API) ---
-def get_ai_response(request):
+# Las vistas del asistente no modifican datos y se llaman desde el catálogo
+# público (que puede servirse desde caché), por eso quedan exentas de CSRF.
+def mensaje_del_chat(request):
     """
-    Se comunica con la API de Gemini para generar una respuesta basada
-    en el mensaje del usuario y el contexto de la página.
+    El texto de `{"message": ...}` en el cuerpo JSON, o None si el cuerpo no es
+    JSON o el mensaje falta o está vacío.
     """
-    if request.method == 'POST':
+    try:
         data = json.loads(request.body)
-        user_message = data.get('message')
-        page_context = data.get('context')
-        
-        prompt = f"""Eres un asistente virtual para una tienda de lencería en línea. Tu objetivo es responder preguntas sobre los productos, métodos de pago y envío, basándote únicamente en la siguiente información. Si la pregunta no se puede responder con la información proporcionada, debes indicar que no tienes esa información y sugerirle que contacte a la tienda por WhatsApp.
+    except ValueError:
+        return None
+    mensaje = data.get('message') if isinstance(data, dict) else None
+    if not isinstance(mensaje, str) or not mensaje.strip():
+        return None
+    return mensaje
 
-        ---
-        INFORMACIÓN DE LA TIENDA:
-        - Productos disponibles: {json.dumps(page_context['products'], indent=2)}
-        - Métodos de pago aceptados: {', '.join(page_context['paymentMethods'])}.
-        - Tiempos de envío: Lima ({page_context['deliveryInfo']['lima']}), Provincia ({page_context['deliveryInfo']['provincia']}).
-        - Información de contacto: WhatsApp ({page_context['contactInfo']['whatsapp']}).
 
-        PREGUNTA DEL USUARIO:
-        {user_message}
-        ---
+MENSAJE_INVALIDO = {"error": "Envía un JSON con un campo 'message' no vacío."}
 
-        Respuesta:"""
+
+@csrf_exempt
+async def get_ai_response(request):
+    """
+    Se comunica con la API de Gemini para generar una respuesta basada
+    en el mensaje del usuario y el digest del catálogo armado en el servidor.
+    Las preguntas repetidas se responden desde la caché.
+    Es asíncrona: bajo ASGI la espera a Gemini no ocupa un worker.
+    """
+    if request.method == 'POST':
+        user_message = mensaje_del_chat(request)
+        if user_message is None:
+            return JsonResponse(MENSAJE_INVALIDO, status=400)
+
+        ai_text = await sync_to_async(asistente.respuesta_en_cache)(user_message)
+        if ai_text is not None:
+            return JsonResponse({"response": ai_text})
 
         try:
             # Reemplaza con tu lógica de manejo de API key.
             api_key = os.environ.get("GEMINI_API_KEY", "")
             if not api_key:
                 return JsonResponse({"error": "API Key no configurada."}, status=500)
-            
-            headers = {"Content-Type": "application/json"}
-            payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
-            api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key={api_key}"
-
-            response = requests.post(api_url, headers=headers, data=json.dumps(payload))
-            response.raise_for_status()
-            
-            result = response.json()
-            ai_text = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', "Lo siento, no pude obtener una respuesta.")
-            
+
+            digest = await sync_to_async(asistente.digest_catalogo)()
+            prompt = asistente.construir_prompt(user_message, digest)
+            ai_text = await asistente.generar_async(prompt, api_key)
+            await sync_to_async(asistente.guardar_respuesta)(user_message, ai_text)
             return JsonResponse({"response": ai_text})
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             return JsonResponse({"error": f"Error de conexión con la API: {str(e)}"}, status=500)
         except Exception as e:
             return JsonResponse({"error": f"Error inesperado: {str(e)}"}, status=500)
@@ -234,6 +293,57 @@ def get_ai_response(request):
     return JsonResponse({"error": "Método no permitido."}, status=405)
 
 
+@csrf_exempt
+async def get_ai_response_stream(request):
+    """
+    Variante asíncrona de `get_ai_response` que reenvía la respuesta de Gemini
+    al chat fragmento a fragmento mediante Server-Sent Events.
+
+    Solo llega por partes bajo ASGI (`SERVIDOR=asgi`). Bajo WSGI Django consume
+    el generador asíncrono entero antes de enviar nada: el chat funciona igual,
+    pero recibe la respuesta completa de una vez.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Método no permitido."}, status=405)
+
+    user_message = mensaje_del_chat(request)
+    if user_message is None:
+        return JsonResponse(MENSAJE_INVALIDO, status=400)
+    api_key = os.environ.get("GEMINI_API_KEY", "")
+
+    async def eventos():
+        cached = await sync_to_async(asistente.respuesta_en_cache)(user_message)
+        if cached is not None:
+            yield asistente.evento_sse({"text": cached})
+            yield asistente.evento_sse({"cached": True}, evento='fin')
+            return
+        if not api_key:
+            yield asistente.evento_sse({"error": "API Key no configurada."}, evento='error')
+            return
+
+        fragmentos = []
+        try:
+            digest = await sync_to_async(asistente.digest_catalogo)()
+            prompt = asistente.construir_prompt(user_message, digest)
+            async for texto in asistente.generar_stream(prompt, api_key):
+                fragmentos.append(texto)
+                yield asistente.evento_sse({"text": texto})
+        except httpx.HTTPError as e:
+            yield asistente.evento_sse({"error": f"Error de conexión con la API: {str(e)}"}, evento='error')
+            return
+
+        respuesta = ''.join(fragmentos) or asistente.RESPUESTA_POR_DEFECTO
+        if not fragmentos:
+            yield asistente.evento_sse({"text": respuesta})
+        await sync_to_async(asistente.guardar_respuesta)(user_message, respuesta)
+        yield asistente.evento_sse({"cached": False}, evento='fin')
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # --- Vistas para el manejo de usuarios (login, logout, etc.) ---
 def login_view(request):
     """
@@ -294,8 +404,32 @@ def dashboard(request):
     Muestra el panel de control del administrador.
     Solo es accesible para usuarios que han iniciado sesión.
     """
-    productos = Producto.objects.all()
-    return render(request, 'mi_app/dashboard.html', {'productos': productos})
+    productos = list(Producto.objects.catalogo())
+
+    # Estado del procesamiento de cada imagen, resuelto en una sola consulta.
+    nombres = []
+    for producto in productos:
+        nombres.append(producto.imagen_principal.name)
+        nombres.extend(variante.imagen.name for variante in producto.variantes.all())
+    tareas = estados_por_archivo(nombres)
+    for producto in productos:
+        producto.tareas_imagen = [
+            (etiqueta, tareas.get(archivo.name))
+            for etiqueta, archivo in [('Principal', producto.imagen_principal)]
+            + [(variante.get_color_display(), variante.imagen) for variante in producto.variantes.all()]
+            if archivo
+        ]
+
+    # Unidades vendidas por producto con un solo agregado.
+    vendidas = dict(
+        LineaPedido.objects.filter(producto__isnull=False)
+        .values_list('producto_id').annotate(total=Sum('cantidad'))
+    )
+    for producto in productos:
+        producto.unidades_vendidas = vendidas.get(producto.pk, 0)
+
+    pedidos = Pedido.objects.order_by('-creado')[:10]
+    return render(request, 'mi_app/dashboard.html', {'productos': productos, 'pedidos': pedidos})
 
 @login_required
 def subir_producto(request, pk=None):
@@ -340,4 +474,60 @@ def eliminar_producto(request, pk):
         producto.delete()
         messages.success(request, f'El producto "{producto.nombre}" ha sido eliminado correctamente.')
         return redirect('dashboard')
-    return render(request, 'mi_app/eliminar_confirmacion.html', {'producto': producto})
\ No newline at end of file
+    return render(request, 'mi_app/eliminar_confirmacion.html', {'producto': producto})
+
+
+@login_required
+def ajustar_stock_view(request):
+    """
+    Pantalla de reposición: muchas variantes en un solo envío, sin abrir el
+    formulario de cada producto.
+    """
+    resultado = None
+    if request.method == 'POST':
+        form = AjusteStockForm(request.POST)
+        if form.is_valid():
+            try:
+                resultado = ajustar_stock(form.cleaned_data['lineas'], request.user, form.cleaned_data['motivo'])
+            except AjusteInvalido as error:
+                form.add_error('lineas', str(error))
+            else:
+                messages.success(request, f'Stock actualizado en {len(resultado)} variantes.')
+                form = AjusteStockForm()
+    else:
+        form = AjusteStockForm()
+
+    recientes = AjusteStock.objects.select_related('variante__producto', 'usuario').order_by('-creado')[:20]
+    return render(request, 'mi_app/ajustar_stock.html', {
+        'form': form, 'resultado': resultado, 'recientes': recientes,
+    })
+
+@login_required
+def ajustar_stock_api(request):
+    """
+    Ajuste masivo en JSON:
+    {"motivo": "...", "ajustes": [{"variante": 12, "delta": 5}, {"variante": 13, "stock": 20}]}
+    Devuelve el stock anterior y el nuevo de cada variante modificada.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    try:
+        datos = json.loads(request.body)
+        ajustes = []
+        for ajuste in datos['ajustes']:
+            if 'delta' in ajuste:
+                ajustes.append((int(ajuste['variante']), DELTA, int(ajuste['delta'])))
+            else:
+                ajustes.append((int(ajuste['variante']), ABSOLUTO, int(ajuste['stock'])))
+        motivo = str(datos.get('motivo', ''))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Formato inválido'}, status=400)
+
+    try:
+        registros = ajustar_stock(ajustes, request.user, motivo)
+    except AjusteInvalido as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse({'ajustes': [
+        {'variante': r.variante_id, 'anterior': r.stock_anterior, 'nuevo': r.stock_nuevo}
+        for r in registros
+    ]})
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mi_proyecto.settings')
+# También sin gunicorn.conf.py (uvicorn, daphne): ver SERVIDOR en settings.
+os.environ.setdefault('SERVIDOR', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,93 @@
+# mi_proyecto/basedatos.py
+
+"""
+Configuración de la conexión a la base de datos según el motor.
+
+SQLite (por defecto en local):
+
+* `journal_mode=WAL`: los lectores no esperan al escritor ni al revés.
+* `synchronous=NORMAL`: con WAL no pierde consistencia y evita un fsync por commit.
+* `mmap_size`: lecturas desde memoria mapeada (`SQLITE_MMAP_SIZE`).
+* `timeout`: espera hasta `SQLITE_BUSY_TIMEOUT` segundos a que se libere el
+  bloqueo en lugar de fallar con "database is locked" (el busy timeout).
+* `transaction_mode=IMMEDIATE`: las transacciones toman el bloqueo de escritura
+  al empezar. Con el modo por defecto, dos checkouts que leen y luego escriben
+  se bloquean mutuamente y SQLite falla al instante, sin respetar el timeout.
+
+PostgreSQL, según `DB_POOL`:
+
+* `persistente` (por defecto): cada worker reutiliza su conexión durante
+  `DB_CONN_MAX_AGE` segundos y comprueba que siga viva antes de usarla
+  (`CONN_HEALTH_CHECKS`). Bajo ASGI las conexiones persistentes no se
+  reutilizan entre peticiones, así que se cierran al terminar cada una.
+* `psycopg`: pool de conexiones de psycopg 3 en cada proceso
+  (`DB_POOL_MIN`, `DB_POOL_MAX`, `DB_POOL_TIMEOUT`); es el adecuado para ASGI.
+* `pgbouncer`: detrás de PgBouncer en modo transacción, sin cursores del lado
+  del servidor.
+* `ninguno`: una conexión por petición.
+
+Con `DB_AJUSTES=False` se usa la configuración tal cual la da `dj_database_url`
+(sirve para comparar con `manage.py benchmark_basedatos`).
+"""
+
+import os
+
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+MODOS_POOL = ('persistente', 'psycopg', 'pgbouncer', 'ninguno')
+
+
+def configurar(url, entorno=os.environ):
+    """
+    Entrada de DATABASES a partir de una URL (`DATABASE_URL`, `REPLICA_DATABASE_URL`).
+    """
+    config = dj_database_url.parse(url, conn_max_age=600)
+    if entorno.get('DB_AJUSTES', 'True') != 'True':
+        return config
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        return configurar_sqlite(config, entorno)
+    if config['ENGINE'] == 'django.db.backends.postgresql':
+        return configurar_postgres(config, entorno)
+    return config
+
+
+def configurar_sqlite(config, entorno=os.environ):
+    pragmas = (
+        'journal_mode=WAL',
+        f"synchronous={entorno.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"mmap_size={int(entorno.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))}",
+    )
+    opciones = config.setdefault('OPTIONS', {})
+    opciones.setdefault('init_command', ';'.join(f'PRAGMA {pragma}' for pragma in pragmas))
+    opciones.setdefault('timeout', float(entorno.get('SQLITE_BUSY_TIMEOUT', '20')))
+    opciones.setdefault('transaction_mode', 'IMMEDIATE')
+    return config
+
+
+def configurar_postgres(config, entorno=os.environ):
+    modo = entorno.get('DB_POOL', 'persistente')
+    if modo not in MODOS_POOL:
+        raise ImproperlyConfigured(f"DB_POOL debe ser uno de {', '.join(MODOS_POOL)}; se recibió {modo!r}.")
+    max_age = int(entorno.get('DB_CONN_MAX_AGE', '600'))
+
+    if modo == 'psycopg':
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured("DB_POOL=psycopg necesita `psycopg[binary,pool]` (psycopg 3).")
+        # El pool ya reutiliza las conexiones; Django no admite ambas cosas.
+        config['CONN_MAX_AGE'] = 0
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(entorno.get('DB_POOL_MIN', '2')),
+            'max_size': int(entorno.get('DB_POOL_MAX', '10')),
+            'timeout': float(entorno.get('DB_POOL_TIMEOUT', '10')),
+        }
+    elif modo == 'ninguno' or (modo == 'persistente' and entorno.get('SERVIDOR') == 'asgi'):
+        config['CONN_MAX_AGE'] = 0
+    else:
+        config['CONN_MAX_AGE'] = max_age
+        config['CONN_HEALTH_CHECKS'] = True
+        if modo == 'pgbouncer':
+            config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
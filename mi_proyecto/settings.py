@@ -1,6 +1,9 @@
 import os
 from pathlib import Path
-import dj_database_url
+
+from django.core.exceptions import ImproperlyConfigured
+
+from mi_proyecto import basedatos
 
 # --------------------------
 # Rutas base
@@ -40,8 +43,15 @@ INSTALLED_APPS = [
 # --------------------------
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise con soporte ASGI (ver `mi_app.middleware`).
+    'mi_app.middleware.WhiteNoiseAsincronoMiddleware',
+    # Antes de SessionMiddleware para medir también el guardado de la sesión.
+    'mi_app.middleware.RendimientoMiddleware',
+    # Solo con réplica: decide si la petición lee el catálogo de ella.
+    'mi_app.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Debe ir después de SessionMiddleware para poder pasar el carrito a la sesión.
+    'mi_app.middleware.CartCookieMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -65,6 +75,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'mi_app.context_processors.cart',
             ],
         },
     },
@@ -72,25 +83,163 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'mi_proyecto.wsgi.application'
 
+# 'wsgi' o 'asgi' (lo fijan gunicorn.conf.py y mi_proyecto/asgi.py). Bajo WSGI
+# cada vista asíncrona corre en un bucle de eventos nuevo por petición.
+SERVIDOR = os.environ.get('SERVIDOR', 'wsgi')
+
 # --------------------------
 # Configuración de Base de Datos
 # --------------------------
+# `DATABASE_URL` (SQLite local por defecto) con los ajustes de cada motor: WAL y
+# busy timeout en SQLite, pool o conexiones persistentes en PostgreSQL (`DB_POOL`).
+# Ver `mi_proyecto.basedatos`.
 DATABASES = {
-    'default': dj_database_url.config(
-        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",  # Local por defecto
-        conn_max_age=600
-    )
+    'default': basedatos.configurar(os.environ.get('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}")),
 }
 
+# Réplica de solo lectura opcional: las lecturas del catálogo van a ella (ver
+# `mi_app.replicas`). En local sirve una copia del archivo SQLite, p. ej.
+# REPLICA_DATABASE_URL=sqlite:////tmp/replica.sqlite3.
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+DATABASE_ROUTERS = []
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = basedatos.configurar(REPLICA_DATABASE_URL)
+    DATABASE_ROUTERS = ['mi_app.replicas.RouterReplica']
+# Segundos que una sesión sigue leyendo de la primaria después de escribir.
+REPLICA_FIJAR_SEGUNDOS = int(os.environ.get('REPLICA_FIJAR_SEGUNDOS', '10'))
+
+# Con SQLite las pruebas usan un archivo (no una base en memoria) para que las
+# pruebas de concurrencia puedan abrir varias conexiones.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+
+# --------------------------
+# Caché
+# --------------------------
+# Las claves de las páginas y fragmentos llevan una versión que se cambia al
+# editar el catálogo (mi_app/versiones.py); la invalidación solo llega a todos
+# si todos los procesos (workers de gunicorn, `procesar_tareas`,
+# `import_catalog`, `conciliar_stock`...) comparten la caché:
+#
+# * 'file' (por defecto): archivos en CACHE_LOCATION, compartida por los
+#   procesos de una misma máquina.
+# * 'redis' (por defecto si hay REDIS_URL): compartida entre máquinas.
+# * 'locmem': memoria del proceso; solo con un único proceso (WEB_CONCURRENCY=1)
+#   y sin escrituras desde comandos. Es la que usan las pruebas
+#   (`mi_proyecto.settings_pruebas`).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'file')
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    if int(os.environ.get('WEB_CONCURRENCY', '1')) > 1:
+        raise ImproperlyConfigured(
+            "CACHE_BACKEND=locmem no se comparte entre los workers de gunicorn "
+            "(WEB_CONCURRENCY > 1): cada uno serviría páginas del catálogo ya "
+            "invalidadas. Usa CACHE_BACKEND=file o redis."
+        )
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"CACHE_BACKEND debe ser file, redis o locmem; se recibió {CACHE_BACKEND!r}.")
+
+# Segundos que se guardan las páginas públicas; las claves llevan versión, así que
+# un cambio en el catálogo las invalida antes.
+CACHE_PAGINAS_TIMEOUT = int(os.environ.get('CACHE_PAGINAS_TIMEOUT', '86400'))
+
 # --------------------------
 # Archivos estáticos
 # --------------------------
 STATIC_URL = '/static/'
-STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATIC_ROOT = os.environ.get('STATIC_ROOT') or BASE_DIR / 'staticfiles'
+# La hoja de estilos y las fuentes de iconos se generan con
+# `manage.py construir_estaticos`; collectstatic les pone hash en el nombre y las
+# comprime (gzip y brotli) para que WhiteNoise las sirva con caché permanente.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# WhiteNoiseAsincronoMiddleware sirve también MEDIA_ROOT; con 'False' se deja a
+# un servidor delante (nginx, CDN).
+SERVIR_MEDIA = os.environ.get('SERVIR_MEDIA', 'True') == 'True'
+# Segundos de caché de los archivos de media sin nombre por contenido (los que
+# lo tienen se cachean para siempre).
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', '3600'))
+
+# --------------------------
+# Cola de tareas de imagen
+# --------------------------
+# Con 'True' las imágenes se procesan al guardar, sin necesidad del worker
+# `manage.py procesar_tareas` (útil en desarrollo).
+TAREAS_SINCRONAS = os.environ.get('TAREAS_SINCRONAS', 'False') == 'True'
+
+# Segundos durante los que no se borra una imagen sin referencias que se subió
+# o reutilizó: cubre la subida que la reutiliza y aún no guardó su fila.
+RECOLECCION_GRACIA = int(os.environ.get('RECOLECCION_GRACIA', '300'))
+
+# --------------------------
+# Carrito
+# --------------------------
+# 'session' guarda el carrito en django_session; 'cookie' usa una cookie firmada
+# y solo pasa a la sesión los carritos que superan CART_COOKIE_MAX_BYTES.
+CART_STORAGE = os.environ.get('CART_STORAGE', 'session')
+CART_COOKIE_MAX_BYTES = int(os.environ.get('CART_COOKIE_MAX_BYTES', '3000'))
+# Segundos que el checkout aparta el stock del carrito antes de liberarlo.
+RESERVA_STOCK_TTL = int(os.environ.get('RESERVA_STOCK_TTL', '900'))
+
+# --------------------------
+# Medición de rendimiento
+# --------------------------
+# Fracción de peticiones (0 a 1) con cabecera Server-Timing y línea de log;
+# p. ej. 0.05 en producción. Con 0 solo se registran las peticiones lentas.
+RENDIMIENTO_MUESTREO = float(os.environ.get('RENDIMIENTO_MUESTREO', '0'))
+# Las peticiones que tardan más (ms) se registran siempre como WARNING.
+RENDIMIENTO_LENTO_MS = float(os.environ.get('RENDIMIENTO_LENTO_MS', '500'))
+
+# Los logs van a stderr, que gunicorn (`--log-file -`) y Render recogen.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'mi_app.rendimiento': {
+            'handlers': ['console'],
+            'level': os.environ.get('RENDIMIENTO_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# --------------------------
+# Asistente virtual (Gemini)
+# --------------------------
+GEMINI_API_BASE = os.environ.get('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash-preview-05-20')
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', '30'))
+# Segundos que se guarda en caché la respuesta a una misma pregunta.
+GEMINI_CACHE_TIMEOUT = int(os.environ.get('GEMINI_CACHE_TIMEOUT', '86400'))
 
 # --------------------------
 # Zona horaria e idioma
@@ -0,0 +1,29 @@
+# mi_proyecto/settings_pruebas.py
+
+"""
+Ajustes de las pruebas: los de `mi_proyecto.settings` con los cambios que no
+dependen del entorno. `manage.py test` los usa por defecto; con otro runner,
+`DJANGO_SETTINGS_MODULE=mi_proyecto.settings_pruebas`.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHE_MAX_ENTRIES, DATABASES
+
+# Caché del proceso: cada prueba la vacía sin tocar la de desarrollo.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    }
+}
+
+# Las pruebas no ejecutan collectstatic, así que usan el almacenamiento sin manifiesto.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# La réplica es un espejo de la base de pruebas; las que prueban el router lo
+# activan con override_settings(DATABASE_ROUTERS=...).
+DATABASES['replica'] = {**DATABASES.get('replica', DATABASES['default']), 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = []
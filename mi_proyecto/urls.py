@@ -2,13 +2,10 @@
 
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('mi_app.urls')),  # Importante: toda ruta específica va en mi_app/urls.py
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# MEDIA_URL lo sirve `mi_app.middleware.WhiteNoiseAsincronoMiddleware`, también en producción.